@@ -1,18 +1,20 @@
 import random
-import copy
+from types import MappingProxyType
 
 class Block:
     '''
         Defines the block - a basic component of the blockchain
+
+        Blocks are immutable once published (BlockStore.intern) and a single Block object is shared
+        by every node holding it. Per-node data (i.e the time the block was added) is kept by the node.
     '''
     def __init__(self, depth=0, id=0, previous=-1,
                  time_created=0, miner=None, transactions=[], size=1.0, consensus=None):
-        
+
         self.depth = depth
         self.id = id
         self.previous = previous
         self.time_created = time_created
-        self.time_added = 0
         self.miner = miner
         self.transactions = transactions
         self.size = size
@@ -21,42 +23,84 @@ class Block:
 
         self.extra_data = {}
 
+        # index in the BlockStore (None until the block is published)
+        self.key = None
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get("key") is not None:
+            raise AttributeError(f"Block {self.id} is immutable (can't set '{name}')")
+        super().__setattr__(name, value)
+
     def __str__(self) -> str:
-        return f"~block: {self.id} | depth: {self.depth} | created/added: {round(self.time_created,2)}/{round(self.time_added,2)} | size: {round(self.size,2)} | prev {self.previous} | {self.extra_data}~"
+        return f"~block: {self.id} | depth: {self.depth} | created: {round(self.time_created,2)} | size: {round(self.size,2)} | prev {self.previous} | {dict(self.extra_data)}~"
 
     def __repr__(self) -> str:
         return f"~block: {self.id}~"
 
-    def copy(self):
-        '''
-            Returns a copy of the block
-        '''
-        new_block = Block(self.depth, self.id, self.previous, self.time_created,
-                          self.miner, self.transactions, self.size, self.consensus)
-                          
-        new_block.extra_data = copy.copy(self.extra_data)
-
-        new_block.time_added = self.time_added
-
-        return new_block
-
-    def to_serializable(self):
+    def to_serializable(self, time_added):
         return {
             "id": self.id,
             "depth": self.depth,
             "previous": self.previous,
             "time_created": self.time_created,
-            "time_added": self.time_added,
+            "time_added": time_added,
             "miner": self.miner,
             "consensus": self.consensus.NAME,
             "size": self.size,
             "round": self.extra_data["round"],
             "transactions": [x for x in self.transactions]
         }
-    
+
     @staticmethod
     def genesis_block():
         '''
             Generates the gensis block
         '''
-        return Block(0, random.randint(0, 10_000), size=0)
\ No newline at end of file
+        return BlockStore.intern(Block(0, random.randint(0, 10_000), size=0))
+
+class BlockStore:
+    '''
+        Shared store of published blocks
+
+        Blocks are interned once (when created by the proposer) and from then on nodes and
+        messages only pass references to the same object instead of copying it.
+
+        blocks: list of published blocks (indexed by Block.key)
+        committed: depth of the deepest block added to the chain of any node (see first_commit)
+    '''
+    blocks = []
+    committed = 0
+
+    @staticmethod
+    def intern(block):
+        '''
+            Publishes *block* - assigns its key in the store and makes it immutable
+        '''
+        if block.key is None:
+            block.extra_data = MappingProxyType(block.extra_data)
+            block.transactions = tuple(block.transactions)
+            block.key = len(BlockStore.blocks)
+            BlockStore.blocks.append(block)
+
+        return block
+
+    @staticmethod
+    def get(key):
+        return BlockStore.blocks[key]
+
+    @staticmethod
+    def first_commit(block):
+        '''
+            True the first time *block* is added to the chain of any node
+            (blocks are only appended on top of the chains - first time seen if deeper than any before)
+        '''
+        if block.depth <= BlockStore.committed:
+            return False
+
+        BlockStore.committed = block.depth
+        return True
+
+    @staticmethod
+    def reset():
+        BlockStore.blocks = []
+        BlockStore.committed = 0
@@ -7,19 +7,22 @@
         round - round change state defined by the rounds module
         fast_path - boolean value determining wether the node is in the fast path or not 
         state - BigFoot node state (new_round, pre-prepared, prepared, committed)]
-        msgs: list of messages received from other nodes
+        msgs: bitsets of the nodes whose prepare/commit votes were received (see Quorum)
         timeout - reference to latest timeout event (when node state updates it is used to find event and delte from event queue)
         fast_path_timeout - reference to fast_path_timeout event
         block -  the proposed block in current round
 '''
 
-from Chain.Block import Block
+from Chain.Block import Block, BlockStore
 from Chain.Parameters import Parameters
 import random
 import Chain.Consensus.Rounds as Rounds
+import Chain.Consensus.Quorum as Quorum
 import Chain.Consensus.HighLevelSync as Sync
+import Chain.Consensus.FastPath as FastPath
+import Chain.Opcodes as Opcodes
+from Chain.NodeTable import NodeTable
 
-from types import SimpleNamespace
 
 from random import randint
 from sys import modules
@@ -35,12 +38,13 @@ def set_state(node):
     alpha =Parameters.execution["alpha"]  # Set this to your desired probability
     node.validator = random.random() <= alpha
 
-    node.state.cp_state = SimpleNamespace(
-        round=Rounds.round_change_state(),
+    node.state.cp_state = NodeTable.cp_state(
+        node,
+        round=Rounds.round_change_state(node=node),
         fast_path=None,
         state="",
         miner="",
-        msgs={'prepare': [], 'commit': []},
+        msgs={'prepare': Quorum.EMPTY, 'commit': Quorum.EMPTY},
         timeout=None,
         fast_path_timeout=None,
         block=None,
@@ -48,19 +52,18 @@ def set_state(node):
     )
 
 def state_to_string(node):
-    s = f"{Rounds.state_to_string(node)} | CP_state: {node.state.cp_state.state} | block: {node.state.cp_state.block.id if node.state.cp_state.block is not None else -1} | msgs: {node.state.cp_state.msgs} | TO: {round(node.state.cp_state.timeout.time,3) if node.state.cp_state.timeout is not None else -1} | FastTO: {round(node.state.cp_state.fast_path_timeout.time,3) if node.state.cp_state.fast_path_timeout is not None else -1}"
+    s = f"{Rounds.state_to_string(node)} | CP_state: {node.state.cp_state.state} | block: {node.state.cp_state.block.id if node.state.cp_state.block is not None else -1} | msgs: { {k: Quorum.voters(v) for k, v in node.state.cp_state.msgs.items()} } | TO: {round(node.state.cp_state.timeout.time,3) if node.state.cp_state.timeout is not None else -1} | FastTO: {round(node.state.cp_state.fast_path_timeout.time,3) if node.state.cp_state.fast_path_timeout is not None else -1}"
     return s
 
 def reset_msgs(node):
-    node.state.cp_state.msgs = {'prepare': [], 'commit': []}
+    node.state.cp_state.msgs = {'prepare': Quorum.EMPTY, 'commit': Quorum.EMPTY}
     Rounds.reset_votes(node)
 
 def get_miner(node, round_robin=False):
     if round_robin:  # new miner in a round robin fashion
-        node.state.cp_state.miner = node.state.cp_state.round.round % Parameters.application[
-            "Nn"]
+        node.state.cp_state.miner = node.state.cp_state.round.round % Parameters.config.Nn
     else:  # get new miner based on the hash of the last block
-        node.state.cp_state.miner = node.last_block.id % Parameters.application["Nn"]
+        node.state.cp_state.miner = node.last_block.id % Parameters.config.Nn
 
 
 def init(node, time=0, starting_round=0):
@@ -70,12 +73,12 @@ def init(node, time=0, starting_round=0):
 
 def create_BigFoot_block(node, time):
     # calculate block creation delays
-    time += Parameters.data["block_interval"] + \
-        Parameters.execution["creation_time"]
+    time += Parameters.config.block_interval + \
+        Parameters.config.creation_time
 
     # create block according to CP
     block = Block(
-        depth=len(node.blockchain),
+        depth=node.blockchain.height + 1,
         id=randint(1, 10000),
         previous=node.last_block.id,
         time_created=time,
@@ -101,7 +104,9 @@ def create_BigFoot_block(node, time):
     if current_pool and time < timeout_time:
         block.transactions, block.size = Parameters.simulation["txion_model"].execute_transactions(
             current_pool)
-        return block, time
+
+        # publish the block (from here on it is shared by reference and immutable)
+        return BlockStore.intern(block), time
     else:
         return -1, -1
 
@@ -110,25 +115,14 @@ def create_BigFoot_block(node, time):
 
 
 def handle_event(event):  # specific to BigFoot - called by events in Handler.handle_event()
-    if event.payload['type'] == 'pre_prepare':
-        return pre_prepare(event)
-    elif event.payload['type'] == 'prepare':
-        return prepare(event)
-    elif event.payload['type'] == 'commit':
-        return commit(event)
-    elif event.payload['type'] == 'timeout' or event.payload['type'] == "fast_path_timeout":
-        return timeout(event)
-    elif event.payload['type'] == 'new_block':
-        return new_block(event)
-    else:
-        return 'unhadled'
+    return dispatch(event)
 
 ########################## PROTOCOL COMMUNICATION ###########################
 
 def process_vote(node, type, sender):
     if node.validator or sender.id==node.id:
         # if node is a validator count vote
-        node.state.cp_state.msgs[type] += [sender.id]
+        node.state.cp_state.msgs[type] = Quorum.add(node.state.cp_state.msgs[type], sender.id)
     # BigFoot does not allow for mutliple blocks to be submitted in 1 round
     #node.state.cp_state.msgs[type] += [sender.id]
 
@@ -138,16 +132,16 @@ def pre_prepare(event):
     state = node.state.cp_state
     block = event.payload['block']
 
-    time += Parameters.execution["msg_val_delay"]
+    time += Parameters.config.msg_val_delay
 
     # if node is a new round state (i.e waiting for a new block to be proposed)
     if state.state == 'new_round':
         # validate block
         if block.depth - 1 == node.last_block.depth and block.extra_data["round"] == state.round.round:
-            time += Parameters.execution["block_val_delay"]
+            time += Parameters.config.block_val_delay
 
             # store block as current block
-            state.block = event.payload['block'].copy()
+            state.block = event.payload['block']
 
             # change state to pre_prepared since block was accepted
             state.state = 'pre_prepared'
@@ -180,7 +174,7 @@ def prepare(event):
     state = node.state.cp_state
     block = event.payload['block']
     
-    time += Parameters.execution["msg_val_delay"]
+    time += Parameters.config.msg_val_delay
 
     if state.state == 'pre_prepared':        
         # count prepare votes from other nodes
@@ -189,7 +183,7 @@ def prepare(event):
         # if we have enough prepare messages
         if not state.fast_path:
             # leader does not issue a prepare message
-            if len(state.msgs['prepare']) >= Parameters.application["required_messages"] - 1:
+            if Quorum.count(state.msgs['prepare']) >= Parameters.config.required_messages - 1:
                 # change to prepared
                 state.state = 'prepared'
 
@@ -207,9 +201,9 @@ def prepare(event):
                 return 'new_state'
         else:
             # leader does not issue a prepare message
-            if len(state.msgs['prepare']) == Parameters.application["Nn"]-1:
+            if Quorum.count(state.msgs['prepare']) == Parameters.config.Nn-1:
                 if state.block is None:
-                    state.block = block.copy()
+                    state.block = block
 
                 node.add_block(state.block, time)
 
@@ -239,14 +233,14 @@ def prepare(event):
         process_vote(node, 'prepare', event.creator)
         
         # if we have enough prepare messages (-1 for leader -1 for slef)
-        if len(state.msgs['prepare']) >= Parameters.application["required_messages"] - 2:
-            time += Parameters.execution["block_val_delay"]
+        if Quorum.count(state.msgs['prepare']) >= Parameters.config.required_messages - 2:
+            time += Parameters.config.block_val_delay
 
             if block.depth -1 == node.last_block.depth:
                 state.round.round = event.payload['round']
 
                 # store block as current block
-                state.block = event.payload['block'].copy()
+                state.block = event.payload['block']
                 block = state.block
 
                 # change state to pre_prepared since block was accepted
@@ -281,15 +275,15 @@ def commit(event):
     node = event.receiver
     time = event.time
     state = node.state.cp_state
-    block = event.payload['block'].copy()
+    block = event.payload['block']
     
-    time += Parameters.execution["msg_val_delay"]
+    time += Parameters.config.msg_val_delay
 
     # if prepared
     if state.state == 'prepared':
         process_vote(node, 'commit', event.creator)
 
-        if len(state.msgs['commit']) >= Parameters.application["required_messages"]:
+        if Quorum.count(state.msgs['commit']) >= Parameters.config.required_messages:
             payload = {
                 'type': 'commit',
                 'block': block,
@@ -328,8 +322,8 @@ def commit(event):
         process_vote(node, 'commit', event.creator)
 
         # if we have enough commit messages (-1 for self)
-        if len(state.msgs['commit']) >= Parameters.application["required_messages"] - 1:
-            time += Parameters.execution["block_val_delay"]
+        if Quorum.count(state.msgs['commit']) >= Parameters.config.required_messages - 1:
+            time += Parameters.config.block_val_delay
 
             if block.depth -1 == node.last_block.depth:
                 state.round.round = event.payload['round']
@@ -339,7 +333,7 @@ def commit(event):
                     state.round.round = event.payload['round']
 
                 if state.block is None:
-                    state.block = block.copy()
+                    state.block = block
 
                 # send commit message (since now node agrees that this block should be commited)
                 payload = {
@@ -352,8 +346,6 @@ def commit(event):
 
                 process_vote(node, 'commit', node)
 
-                block.extra_data["votes"] = node.state.cp_state.msgs
-
                 # send new block message since we have received enough commit messages
                 node.add_block(block, time)
 
@@ -384,14 +376,14 @@ def new_block(event):
     block = event.payload['block']
     time = event.time
 
-    time += Parameters.execution["msg_val_delay"] + Parameters.execution["block_val_delay"]
+    time += Parameters.config.msg_val_delay + Parameters.config.block_val_delay
     
     # old block (ignore)
-    if block.depth <= node.blockchain[-1].depth:
+    if block.depth <= node.blockchain.height:
         return "invalid"
     
     # future block (sync)
-    elif block.depth > node.blockchain[-1].depth + 1:
+    elif block.depth > node.blockchain.height + 1:
         if node.state.synced:
             node.state.synced = False
             Sync.create_local_sync_event(node, event.creator, time)
@@ -409,6 +401,43 @@ def new_block(event):
         start(node, event.payload['round']+1, time)
         return "handled"
 
+def propose(event):
+    '''
+        leader proposal at block creation time (engine: hybrid) - the round is calculated by FastPath if
+        it is fault free, otherwise the pre_prepare message is broadcast as usual
+    '''
+    node = event.creator
+    state = node.state.cp_state
+
+    if event.payload['round'] != state.round.round or event.payload['block'] is not state.block:
+        return "invalid"
+
+    if not FastPath.try_round(node, state.block, event.time, modules[__name__]):
+        payload = {
+            'type': 'pre_prepare',
+            'block': state.block,
+            'round': state.round.round,
+        }
+
+        node.scheduler.schedule_broadcast_message(
+            node, event.time, payload, handle_event)
+
+    return "handled"
+
+def fast_commit(event):
+    '''
+        commit of a round calculated by FastPath (replaces the prepare/commit messages of the round)
+    '''
+    node = event.creator
+    time = event.time
+
+    if not FastPath.valid(event) or event.payload['round'] != node.state.cp_state.round.round:
+        return "invalid"
+
+    node.add_block(event.payload['block'], time)
+    start(node, event.payload['round'] + 1, time)
+    return "new_state"
+
 ########################## ROUND CHANGE ###########################
 
 def init_round_chage(node, time):
@@ -420,6 +449,7 @@ def start(node, new_round, time):
         return 0
 
     state = node.state.cp_state
+    FastPath.note_start(node, time)
 
     state.state = 'new_round'
     state.fast_path = True
@@ -434,8 +464,8 @@ def start(node, new_round, time):
     get_miner(node)
 
     if state.miner == node.id:
-        schedule_timeout(node, Parameters.data["block_interval"] + time)
-        schedule_timeout(node, Parameters.data["block_interval"] + time,
+        schedule_timeout(node, Parameters.config.block_interval + time)
+        schedule_timeout(node, Parameters.config.block_interval + time,
                           fast_path=True)
 
         block, creation_time = create_BigFoot_block(node, time)
@@ -445,19 +475,24 @@ def start(node, new_round, time):
             return 0
 
         state.state = 'pre_prepared'
-        state.block = block.copy()
+        state.block = block
 
-        payload = {
-            'type': 'pre_prepare',
-            'block': block,
-            'round': new_round,
-        }
+        if FastPath.active():
+            # hybrid engine: the leader decides at creation time if the round can be calculated (see FastPath)
+            node.scheduler.schedule_event(
+                node, creation_time, {'type': 'propose', 'block': block, 'round': new_round}, handle_event)
+        else:
+            payload = {
+                'type': 'pre_prepare',
+                'block': block,
+                'round': new_round,
+            }
 
-        node.scheduler.schedule_broadcast_message(
-            node, creation_time, payload, handle_event)
+            node.scheduler.schedule_broadcast_message(
+                node, creation_time, payload, handle_event)
     else:
-        schedule_timeout(node, Parameters.data["block_interval"] + time)
-        schedule_timeout(node, Parameters.data["block_interval"] + time,
+        schedule_timeout(node, Parameters.config.block_interval + time)
+        schedule_timeout(node, Parameters.config.block_interval + time,
                           fast_path=True)
 
 ########################## TIMEOUTS ###########################
@@ -483,7 +518,7 @@ def timeout(event):
                 return "handled"
 
             # In case fast path times out - check if we have enough prepare votes now (if so go to prepared state)
-            if state.block is not None and len(state.msgs['prepare']) >= Parameters.application["required_messages"] - 1:
+            if state.block is not None and Quorum.count(state.msgs['prepare']) >= Parameters.config.required_messages - 1:
                 # change to prepared
                 state.state = 'prepared'
 
@@ -524,31 +559,25 @@ def schedule_timeout(node, time, remove=True, add_time=True, fast_path=False):
         node.state.fast_path = True
 
         if node.state.cp_state.fast_path_timeout is not None:
-            try:
-                node.remove_event(node.state.cp_state.fast_path_timeout)
-            except ValueError:
-                pass
+            node.cancel_timer(node.state.cp_state.fast_path_timeout)
 
         if add_time:
-            time += float(Parameters.BigFoot["fast_path_timeout"])
+            time += Parameters.config.fast_path_timeout
 
         payload = {
             'type': 'fast_path_timeout',
             'round': node.state.cp_state.round.round,
         }
         event = node.scheduler.schedule_event(
-            node, time, payload, handle_event)
+            node, time, payload, handle_event, queue="timer")
 
         node.state.cp_state.fast_path_timeout = event
     else:
         if node.state.cp_state.timeout is not None and remove:
-            try:
-                node.remove_event(node.state.cp_state.timeout)
-            except ValueError:
-                pass
+            node.cancel_timer(node.state.cp_state.timeout)
 
         if add_time:
-            time += float(Parameters.BigFoot['timeout'])
+            time += Parameters.config.BigFoot_timeout
 
         payload = {
             'type': 'timeout',
@@ -556,7 +585,7 @@ def schedule_timeout(node, time, remove=True, add_time=True, fast_path=False):
         }
 
         event = node.scheduler.schedule_event(
-            node, time, payload, handle_event)
+            node, time, payload, handle_event, queue="timer")
 
         node.state.cp_state.timeout = event
 
@@ -577,6 +606,19 @@ def resync(node, payload, time):
 
 
 def clean_up(node):
-    for event in node.queue.event_list:
-        if event.payload["CP"] == NAME:
-            node.queue.remove_event(event)
+    '''
+        Invalidates the pending BigFoot events of the node in O(1) - they are discarded when they reach the front of the queue
+    '''
+    node.state.cp_epoch += 1
+
+# message / event type -> handler (see Opcodes.Dispatch and handle_event)
+dispatch = Opcodes.Dispatch({
+    'pre_prepare': pre_prepare,
+    'prepare': prepare,
+    'commit': commit,
+    'timeout': timeout,
+    'fast_path_timeout': timeout,
+    'new_block': new_block,
+    'propose': propose,
+    'fast_commit': fast_commit,
+}, default=lambda event: 'unhadled')
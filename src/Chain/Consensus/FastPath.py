@@ -0,0 +1,277 @@
+'''
+    Abstract fast path for fault free PBFT/BigFoot rounds (Parameters.execution["engine"] == "hybrid")
+
+    In a fault free round over a broadcast network the time at which each node reaches a quorum is an
+    order statistic of message arrival times. Instead of simulating every prepare/commit message, when the
+    leader proposes a block (a 'propose' event at block creation time) the round is calculated with np.partition
+    over the delay matrix (Network.delay_matrix) and a single 'fast_commit' event is scheduled per node.
+
+    The model follows the message level handlers:
+        pre_prepare arrives at i:       a_i = creation + D[L,i]
+        prepare sent by i (i != L):     p_i = a_i + msg_val + block_val
+        PBFT  prepared at j:            q_j = k-th prepare arrival at j + msg_val  (k: required - 2, leader: required - 1)
+              committed at m:           C_m = (required - 1)-th commit arrival at m + msg_val
+                                              (or first new_block arrival + msg_val + block_val if earlier)
+        BigFoot (fast path) at j:       C_j = last prepare arrival at j + msg_val  (all Nn - 1 votes)
+    (votes that arrive before the node reaches the matching state are backlogged and handled with their own time)
+
+    The message level protocol is used (the round falls back) whenever the model's assumptions do not hold:
+        not every node is an alive, synced validator waiting for the round, a round message would arrive before
+        a node started the round, a quorum would be reached after a timeout, or a node fault is scheduled before
+        the round ends. Faults scheduled while a fast round is in flight abort it (its remaining fast_commit
+        events are discarded and the nodes recover through the normal timeouts / round change).
+
+    start_times: time each node started (or will start - see pending) its current round
+    pending: round each node will start through a scheduled fast_commit (-1: none)
+'''
+import numpy as np
+
+from types import SimpleNamespace
+
+from Chain.Parameters import Parameters
+from Chain.Network import Network
+from Chain.TimeSeries import TimeSeries
+from Chain.NodeTable import NodeTable
+
+sim = None
+
+start_times = np.zeros(0)
+pending = np.zeros(0, dtype=np.int64)
+
+# incremented when a fast round is aborted - cutoffs: aborted epoch -> time from which its fast_commit events are discarded
+epoch = 0
+cutoffs = {}
+round_end = -1
+
+rounds = 0
+
+def init(simulation):
+    global sim, start_times, pending, epoch, cutoffs, round_end, rounds
+    sim = simulation
+    start_times = np.zeros(len(sim.nodes))
+    pending = np.full(len(sim.nodes), -1, dtype=np.int64)
+    epoch = 0
+    cutoffs = {}
+    round_end = -1
+    rounds = 0
+
+def active():
+    return Parameters.config.engine == "hybrid"
+
+def note_start(node, time):
+    '''
+        called when *node* starts a round (PBFT/BigFoot start)
+    '''
+    if node.id < len(start_times):
+        start_times[node.id] = time
+        pending[node.id] = -1
+
+def abort(time):
+    '''
+        aborts the fast round in flight from *time* on (fast_commit events before *time* are still handled)
+    '''
+    global start_times, pending, epoch, round_end
+    cutoffs[epoch] = time
+    epoch += 1
+    round_end = -1
+
+    # nodes were added/removed - start times of new nodes are unknown until they start a round
+    if len(start_times) != len(sim.nodes):
+        start_times = np.concatenate((start_times, np.full(len(sim.nodes), np.inf)))[:len(sim.nodes)]
+    pending = np.full(len(sim.nodes), -1, dtype=np.int64)
+
+def fault_scheduled(time):
+    '''
+        called when a node fault is scheduled at *time* - the fast round in flight is aborted if it ends after the fault
+    '''
+    if time <= round_end:
+        abort(time)
+
+def valid(event):
+    '''
+        True if the fast_commit *event* was not aborted
+    '''
+    e = event.payload['epoch']
+    return e == epoch or event.time < cutoffs.get(e, -1)
+
+def message_delays(type, block, round, cp):
+    size = Network.size(SimpleNamespace(payload={'type': type, 'block': block, 'round': round, 'CP': cp.NAME}))
+    return Network.delay_matrix(size)
+
+def arrivals(send_times, delays, senders):
+    '''
+        arrival time at every node (columns) of the messages broadcast by *senders* (rows) at *send_times*
+        (inf: not sent - a node does not receive its own message)
+
+        Leading dimensions are batch dimensions (e.g. replicas - see Ensemble)
+    '''
+    times = np.where(senders[..., :, None], send_times[..., :, None] + delays, np.inf)
+    idx = np.arange(times.shape[-1])
+    times[..., idx, idx] = np.inf
+
+    return times
+
+def kth(times, k):
+    '''
+        k-th (1-based) smallest arrival at every node
+    '''
+    return np.partition(times, k - 1, axis=-2)[..., k - 1, :]
+
+def eligible(leader, round):
+    nodes = sim.nodes
+    Nn = len(nodes)
+
+    if Parameters.config.network_type != "broadcast" or len(start_times) != Nn or Nn < 3:
+        return False
+
+    if NodeTable.enabled:
+        return eligible_table(leader, round)
+
+    for i, node in enumerate(nodes):
+        if node.id != i or not node.state.alive or not node.state.synced or not node.validator:
+            return False
+        if node.state.cp is not leader.state.cp:
+            return False
+
+        if node is leader or pending[i] == round:
+            continue
+
+        state = node.state.cp_state
+        if state.state != 'new_round' or state.round.round != round:
+            return False
+
+    return True
+
+def eligible_table(leader, round):
+    '''
+        eligible over the NodeTable columns (vectorised) - rows of the nodes taking part in the simulation
+    '''
+    ids = NodeTable.member_ids()
+    Nn = len(sim.nodes)
+    if len(ids) != Nn or ids[-1] != Nn - 1:
+        return False
+
+    ok = NodeTable.alive[ids] & NodeTable.synced[ids] & NodeTable.validator[ids] & (NodeTable.cp[ids] == NodeTable.cp[leader.id])
+
+    # every other node waits for the round (or will start it through a fast_commit)
+    waiting = (NodeTable.state[ids] == NodeTable.intern(NodeTable.states, 'new_round')) & (NodeTable.round[ids] == round)
+    waiting |= pending == round
+    waiting[leader.id] = True
+
+    return bool((ok & waiting).all())
+
+def fault_before(time):
+    return any(e.payload["type"] == "node fault" and e.time <= time for e in sim.system_queue.event_list)
+
+def round_model(name, creation_time, leader, delays):
+    '''
+        Order statistics model of a fault free round of CP *name* (PBFT or BigFoot)
+
+        creation_time: time the leader broadcasts the pre_prepare, leader: index of the leader
+        delays(type): delay matrix (sender, receiver) of the message *type*
+        (leading dimensions of the arguments are batch dimensions - e.g. replicas, see Ensemble)
+
+        returns a SimpleNamespace with (per node)
+            commit_times: time the block is added, earliest: first round message arrival,
+            broadcasts: messages broadcast, prepare_times/prepared/committed/shortcut: intermediate times (PBFT)
+    '''
+    msg_val = Parameters.config.msg_val_delay
+    block_val = Parameters.config.block_val_delay
+
+    pre_prepare_delays = delays('pre_prepare')
+    Nn = pre_prepare_delays.shape[-1]
+    creation_time = np.asarray(creation_time, dtype=float)
+    leader = np.asarray(leader)
+
+    is_leader = leader[..., None] == np.arange(Nn)
+    everyone = np.ones(is_leader.shape, dtype=bool)
+
+    # pre_prepare (leader) -> prepare (everyone else)
+    pre_prepare = creation_time[..., None] + np.take_along_axis(pre_prepare_delays, leader[..., None, None], axis=-2)[..., 0, :]
+    pre_prepare = np.where(is_leader, np.inf, pre_prepare)
+    prepare_times = pre_prepare + msg_val + block_val
+    prepares = arrivals(prepare_times, delays('prepare'), ~is_leader)
+
+    model = SimpleNamespace(prepare_times=prepare_times, prepared=None, committed=None, shortcut=None)
+    model.earliest = np.minimum(pre_prepare, prepares.min(axis=-2))
+
+    if name == "PBFT":
+        required = Parameters.config.required_messages
+
+        # prepared: own vote + required - 2 prepares (the leader does not vote on its own block: required - 1)
+        model.prepared = np.where(is_leader, kth(prepares, required - 1), kth(prepares, required - 2)) + msg_val
+
+        # committed: own vote + required - 1 commits
+        commits = arrivals(model.prepared, delays('commit'), everyone)
+        model.committed = kth(commits, required - 1) + msg_val
+
+        # ... or the new_block of a node that committed earlier (handled in any state)
+        new_blocks = arrivals(model.committed, delays('new_block'), everyone)
+        new_block = new_blocks.min(axis=-2) + msg_val + block_val
+
+        model.shortcut = new_block < model.committed
+        model.commit_times = np.where(model.shortcut, new_block, model.committed)
+
+        model.earliest = np.minimum(model.earliest, np.minimum(commits.min(axis=-2), new_blocks.min(axis=-2)))
+        # pre_prepare / prepare, commit when prepared, commit + new_block when committed
+        model.broadcasts = 2 + np.where(model.shortcut, 0, 2)
+    else:
+        # fast path: every vote (own + Nn - 2 prepares, the leader: Nn - 1 prepares)
+        model.commit_times = np.where(is_leader, kth(prepares, Nn - 1), kth(prepares, Nn - 2)) + msg_val
+        model.broadcasts = np.ones(is_leader.shape, dtype=np.int64)
+
+    return model
+
+def try_round(leader, block, creation_time, cp):
+    '''
+        Calculates the round of *block* (proposed by *leader* at *creation_time*) with the abstract model and
+        schedules its fast_commit events - returns False (nothing scheduled) if the round must be simulated message by message
+    '''
+    global round_end, rounds
+
+    round = leader.state.cp_state.round.round
+
+    if not active() or not eligible(leader, round):
+        return False
+    if cp.NAME == "PBFT" and Parameters.config.required_messages < 3:
+        return False
+
+    Nn = len(sim.nodes)
+    model = round_model(cp.NAME, creation_time, leader.id, lambda type: message_delays(type, block, round, cp))
+    commit_times, broadcasts = model.commit_times, model.broadcasts
+
+    starts = start_times
+    deadlines = starts + Parameters.config.block_interval + getattr(Parameters.config, f"{cp.NAME}_timeout")
+    if cp.NAME == "BigFoot":
+        deadlines = np.minimum(deadlines, starts + Parameters.config.block_interval + Parameters.config.fast_path_timeout)
+
+    end = commit_times.max()
+    if np.any(model.earliest < starts) or np.any(commit_times >= deadlines) or fault_before(end):
+        return False
+
+    # the last round of the run is simulated (it does not complete before simTime)
+    if end > Parameters.simulation["simTime"]:
+        return False
+
+    # each broadcast reaches the other Nn - 1 nodes (exported message tables do not include fast rounds)
+    total = int(broadcasts.sum())
+    for i, node in enumerate(sim.nodes):
+        node.total_messages += int(broadcasts[i]) * (Nn - 1) + total - int(broadcasts[i])
+
+    sends = [[creation_time], model.prepare_times[np.arange(Nn) != leader.id]]
+    if cp.NAME == "PBFT":
+        sends += [model.prepared, model.committed[~model.shortcut], model.committed[~model.shortcut]]
+    for times in sends:
+        for t in times:
+            TimeSeries.note_message(t, Nn - 1)
+
+    for i, node in enumerate(sim.nodes):
+        node.scheduler.schedule_event(
+            node, float(commit_times[i]), {'type': 'fast_commit', 'block': block, 'round': round, 'epoch': epoch}, cp.handle_event)
+
+    start_times[:] = commit_times
+    pending[:] = round + 1
+    round_end = end
+    rounds += 1
+
+    return True
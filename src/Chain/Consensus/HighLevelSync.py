@@ -1,22 +1,30 @@
 '''
     Models a high-level sync functionality. Caclulates how long it would take for the node to receive the data
-    (missing blocks) and creats a local event which copies the missing blocks to the desynced node saving communication
-    events
+    (missing blocks) and creats a local event which appends the missing blocks to the desynced node saving communication
+    events (blocks are shared - only references and the per-node times added are transfered)
+
+    Two sync modes are supported (Parameters.execution["sync_mode"]):
+        fast:  all missing blocks are transfered from the request node in a single local event
+        range: missing blocks are requested in chunks of Parameters.execution["sync_window"] blocks, with up to
+               Parameters.execution["sync_parallel_requests"] chunk requests in flight to different neighbours.
+               Each chunk is checked when it arrives and failed chunks (offline/byzantine peers) are re-requested
+               from another neighbour so a single bad peer can not stall the sync
 '''
 
 from Chain.Network import Network
 from Chain.Parameters import Parameters
 
 import Chain.tools as tools
+import Chain.Opcodes as Opcodes
+
+from random import randint, sample, choice
+from types import SimpleNamespace
 
-from random import randint, sample
+import numpy as np
 
 
 def handler(event):
-    if event.payload["type"] == "local_fast_sync":
-        return handle_local_sync_event(event)
-    else:
-        return "unhadled"
+    return dispatch(event)
 
 
 def create_local_sync_event(desynced_node, request_node, time):
@@ -25,20 +33,19 @@ def create_local_sync_event(desynced_node, request_node, time):
         (node from which we request missing blocks i.e node whos message made us know we are desynced)
         Calculate transmission + validation delay and create local sync event after
     '''
-    latest_block = desynced_node.last_block
-    missing_blocks = [b.copy() for b in request_node.blockchain if b.depth > latest_block.depth]    
-
-    total_delay = 0    
-    delay=0
-    for i, b in enumerate(missing_blocks):
-        delay_network = Network.calculate_message_propagation_delay(
-            request_node, desynced_node, b.size)
+    if Parameters.execution["sync_mode"] == "range":
+        return start_range_sync(desynced_node, request_node, time)
 
-        delay = delay_network + Parameters.execution["block_val_delay"] + Parameters.execution["sync_message_request_delay"]
+    ledger = request_node.blockchain
+    idx = ledger.index_above(desynced_node.last_block.depth)
+    missing_blocks = ledger.blocks[idx:]
 
-        total_delay += delay    
+    # time each missing block is received and validated (transfer of the blocks is pipelined)
+    delays = Network.calculate_sync_delays(
+        request_node, desynced_node, np.frombuffer(ledger.sizes[idx:], dtype=float))
 
-        missing_blocks[i].time_added += delay
+    total_delay = delays[-1] if missing_blocks else 0
+    times_added = (time + delays).tolist()
 
     missbehave_delay, missbehaviour = apply_sync_missbehaiviour(request_node)
     
@@ -48,6 +55,7 @@ def create_local_sync_event(desynced_node, request_node, time):
             "request_node": request_node,
             "type": 'local_fast_sync',
             "blocks": None,
+            "times_added": None,
             "fail": True,
         }
 
@@ -58,11 +66,12 @@ def create_local_sync_event(desynced_node, request_node, time):
             "request_node": request_node,
             "type": 'local_fast_sync',
             "blocks": missing_blocks,
+            "times_added": times_added,
             "fail": False,
         }
 
         desynced_node.scheduler.schedule_event(
-            desynced_node, time+delay, payload, handler, queue="sync")
+            desynced_node, time+total_delay, payload, handler, queue="sync")
     
 
 def handle_local_sync_event(event):
@@ -76,11 +85,11 @@ def handle_local_sync_event(event):
         create_local_sync_event(node, sample(node.neighbours, 1)[0], event.time)
     else:
         received_blocks = event.payload['blocks']
-        for b in received_blocks:
+        for b, t in zip(received_blocks, event.payload['times_added']):
             # there is a chance the node was updated before this message made it to them 
             # so checking to not add repeat blocks
-            if b.depth == node.blockchain[-1].depth + 1:
-                node.blockchain.append(b)
+            if b.depth == node.blockchain.height + 1:
+                node.add_synced_block(b, t, event.time)
         
         # while the node is desynced keep asking for blocks
         if node.last_block.depth < event.payload["request_node"].last_block.depth:
@@ -98,6 +107,168 @@ def handle_local_sync_event(event):
         if node.update(event.time):
             return 0
 
+########################## RANGE SYNC ###########################
+
+def start_range_sync(node, request_node, time):
+    '''
+        Begins a range sync of *node* up to the current height of *request_node*
+    '''
+    if node.state.sync is not None:
+        # already syncing - the target will be extended once the current range is done
+        return 0
+
+    node.state.sync = SimpleNamespace(
+        started=time,
+        target=request_node.blockchain.height,
+        next_depth=node.blockchain.height + 1,  # first depth not yet requested
+        request_node=request_node,
+        in_flight={},  # start depth -> (peer, end depth)
+        received={},   # start depth -> (blocks, times_added)
+    )
+
+    request_chunks(node, time)
+
+def sync_peers(node, end, exclude=()):
+    '''
+        Neighbours (and the original request node) that hold the blocks up to depth *end*
+        Peers not already serving a request are preferred
+    '''
+    sync = node.state.sync
+    # (the request node is usually one of the neighbours - listed once so it is not picked more often)
+    candidates = [sync.request_node] + [p for p in node.neighbours if p is not sync.request_node]
+    candidates = [p for p in candidates if p is not node and p not in exclude and p.blockchain.height >= end]
+
+    busy = [peer for peer, _ in sync.in_flight.values()]
+    idle = [p for p in candidates if p not in busy]
+
+    return idle if idle else candidates
+
+def request_chunks(node, time):
+    '''
+        Keeps up to sync_parallel_requests chunk requests in flight until every depth up to the target is requested
+    '''
+    sync = node.state.sync
+
+    while len(sync.in_flight) < Parameters.execution["sync_parallel_requests"] and sync.next_depth <= sync.target:
+        start = sync.next_depth
+        end = min(start + Parameters.execution["sync_window"] - 1, sync.target)
+
+        peers = sync_peers(node, end)
+        if not peers:
+            break
+
+        request_chunk(node, choice(peers), start, end, time)
+        sync.next_depth = end + 1
+
+def request_chunk(node, peer, start, end, time):
+    '''
+        Requests blocks [start, end] from *peer* and creates the local event for when the chunk arrives
+    '''
+    node.state.sync.in_flight[start] = (peer, end)
+
+    missbehave_delay, missbehaviour = apply_sync_missbehaiviour(peer)
+
+    payload = {
+        "request_node": peer,
+        "type": 'sync_chunk',
+        "start": start,
+        "end": end,
+        "blocks": None,
+        "times_added": None,
+        "fail": missbehaviour,
+    }
+
+    if missbehaviour:
+        delay = missbehave_delay
+    else:
+        ledger = peer.blockchain
+        idx = ledger.index_above(start - 1)
+        payload["blocks"] = ledger.blocks[idx: idx + end - start + 1]
+
+        delays = Network.calculate_sync_delays(
+            peer, node, np.frombuffer(ledger.sizes[idx: idx + end - start + 1], dtype=float))
+
+        payload["times_added"] = (time + delays).tolist()
+        delay = delays[-1]
+
+    node.scheduler.schedule_event(node, time + delay, payload, handler, queue="sync")
+
+def valid_chunk(payload):
+    '''
+        Checks that a received chunk holds the requested, linked, range of blocks
+    '''
+    blocks = payload["blocks"]
+
+    if payload["fail"] or not blocks or blocks[0].depth != payload["start"] or blocks[-1].depth != payload["end"]:
+        return False
+
+    return all(b.depth == prev.depth + 1 and b.previous == prev.id for prev, b in zip(blocks[:-1], blocks[1:]))
+
+def handle_sync_chunk_event(event):
+    '''
+        Stores the received chunk, appends every chunk that continues the local chain and keeps
+        requesting chunks until the node reaches the height of the request node
+    '''
+    node = event.creator
+    sync = node.state.sync
+    start = event.payload["start"]
+
+    # chunk of a previous (finished) sync
+    if sync is None or start not in sync.in_flight:
+        return "invalid"
+
+    peer, end = sync.in_flight.pop(start)
+
+    if not valid_chunk(event.payload):
+        # re-request the chunk from a different peer
+        peers = sync_peers(node, end, exclude=(peer,))
+        request_chunk(node, choice(peers) if peers else peer, start, end, event.time)
+        return "handled"
+
+    sync.received[start] = (event.payload["blocks"], event.payload["times_added"])
+
+    # append the chunks that continue the chain (chunks may arrive out of order)
+    while sync.received:
+        next_start = min(sync.received)
+        if next_start > node.blockchain.height + 1:
+            break
+
+        blocks, times = sync.received.pop(next_start)
+        for b, t in zip(blocks, times):
+            # the node may have added some of these blocks through the CP in the meantime
+            if b.depth == node.blockchain.height + 1 and b.previous == node.last_block.id:
+                node.add_synced_block(b, t, event.time)
+
+    request_chunks(node, event.time)
+
+    if sync.in_flight:
+        return "handled"
+
+    # the chain of the request node may have grown while syncing
+    if node.blockchain.height < sync.request_node.blockchain.height:
+        sync.target = sync.request_node.blockchain.height
+        sync.next_depth = node.blockchain.height + 1
+        request_chunks(node, event.time)
+
+        if sync.in_flight:
+            return "handled"
+
+    # adds time of final check
+    event.time += Parameters.execution["sync_message_request_delay"]
+
+    tools.debug_logs(msg=lambda: f"{node} synced to {node.blockchain.height} in {round(event.time - sync.started, 3)}", col=47)
+
+    node.state.sync = None
+    node.state.synced = True
+
+    if node.last_block.consensus is not None:
+        node.last_block.consensus.resync(node, {"blocks": [node.last_block]}, event.time)
+
+    if node.update(event.time):
+        return 0
+
+    return "handled"
+
 def apply_sync_missbehaiviour(sender):
     '''
         Checks whether the requesting node is:
@@ -113,11 +284,17 @@ def apply_sync_missbehaiviour(sender):
             roll_type = randint(0, 100)
             if roll_type < 50:
                 ########### BAD DATA ############
-                tools.debug_logs(msg=f"node {sender} sent bad sync data!", col=47)
+                tools.debug_logs(msg=lambda: f"node {sender} sent bad sync data!", col=47)
                 delay = Parameters.behaiviour["sync"]["bad_data"]["delay"]
             else:
-                tools.debug_logs(msg=f"node {sender} did not respond to sync message!", col=47)
+                tools.debug_logs(msg=lambda: f"node {sender} did not respond to sync message!", col=47)
                 ########### NO RESPONSE #########
                 delay = Parameters.behaiviour["sync"]["no_response"]["delay"]
             return delay, True
     return 0, False
+
+# event type -> handler (see Opcodes.Dispatch)
+dispatch = Opcodes.Dispatch({
+    'local_fast_sync': handle_local_sync_event,
+    'sync_chunk': handle_sync_chunk_event,
+}, default=lambda event: "unhadled")
@@ -5,18 +5,21 @@
         round - current round
         change_to - canditate round to change to
         state - PBFT node state (new_round, pre-prepared, prepared, committed, round_change)]
-        msgs: list of messages received from other nodes
+        msgs: bitsets of the nodes whose prepare/commit votes were received (see Quorum)
         timeout - reference to latest timeout event (when node state updates it is used to find event and delte from event queue)
         block -  the current proposed block
 '''
 
-from Chain.Block import Block
+from Chain.Block import Block, BlockStore
 from Chain.Parameters import Parameters
 
 import Chain.Consensus.Rounds as Rounds
+import Chain.Consensus.Quorum as Quorum
 import Chain.Consensus.HighLevelSync as Sync
+import Chain.Consensus.FastPath as FastPath
+import Chain.Opcodes as Opcodes
+from Chain.NodeTable import NodeTable
 
-from types import SimpleNamespace
 
 from random import randint
 from sys import modules
@@ -33,11 +36,12 @@ def set_state(node):
     alpha =Parameters.execution["alpha"]  # Set this to your desired probability
     node.validator = random.random() <= alpha
 
-    node.state.cp_state = SimpleNamespace(
-        round=Rounds.round_change_state(),
+    node.state.cp_state = NodeTable.cp_state(
+        node,
+        round=Rounds.round_change_state(node=node),
         state="",
         miner="",
-        msgs={'prepare': [], 'commit': []},
+        msgs={'prepare': Quorum.EMPTY, 'commit': Quorum.EMPTY},
         timeout=None,
         block=None,
         validator=node.validator,
@@ -46,19 +50,18 @@ def set_state(node):
 
 
 def state_to_string(node):
-    s = f"{Rounds.state_to_string(node)} | CP_state: {node.state.cp_state.state} | block: {node.state.cp_state.block.id if node.state.cp_state.block is not None else -1} | msgs: {node.state.cp_state.msgs} | TO: {round(node.state.cp_state.timeout.time,3) if node.state.cp_state.timeout is not None else -1}"
+    s = f"{Rounds.state_to_string(node)} | CP_state: {node.state.cp_state.state} | block: {node.state.cp_state.block.id if node.state.cp_state.block is not None else -1} | msgs: { {k: Quorum.voters(v) for k, v in node.state.cp_state.msgs.items()} } | TO: {round(node.state.cp_state.timeout.time,3) if node.state.cp_state.timeout is not None else -1}"
     return s
 
 
 def reset_msgs(node):
-    node.state.cp_state.msgs = {'prepare': [], 'commit': []}
+    node.state.cp_state.msgs = {'prepare': Quorum.EMPTY, 'commit': Quorum.EMPTY}
     Rounds.reset_votes(node)
 
 
 def get_miner(node, round_robin=True):
     if round_robin:  # new miner in a round robin fashion
-        node.state.cp_state.miner = node.state.cp_state.round.round % Parameters.application[
-            "Nn"]
+        node.state.cp_state.miner = node.state.cp_state.round.round % Parameters.config.Nn
     else:  # get new miner based on the hash of the last block
         node.state.cp_state.miner = node.last_block.id % Parameters.application["Nbp"]
 
@@ -70,11 +73,11 @@ def init(node, time=0, starting_round=0):
 
 def create_PBFT_block(node, time):
     # calculate block creation delays
-    time += Parameters.data["block_interval"] + Parameters.execution["creation_time"]
+    time += Parameters.config.block_interval + Parameters.config.creation_time
 
     # create block according to CP
     block = Block(
-        depth=len(node.blockchain),
+        depth=node.blockchain.height + 1,
         id=randint(1, 10000),
         previous=node.last_block.id,
         time_created=time,
@@ -103,7 +106,8 @@ def create_PBFT_block(node, time):
         block.transactions, block.size = Parameters.simulation["txion_model"].execute_transactions(
             current_pool)
 
-        return block, time
+        # publish the block (from here on it is shared by reference and immutable)
+        return BlockStore.intern(block), time
     else:
         return -1, -1
 
@@ -111,18 +115,7 @@ def create_PBFT_block(node, time):
 
 
 def handle_event(event):  # specific to PBFT - called by events in Handler.handle_event()
-    if event.payload['type'] == 'pre_prepare':
-        return pre_prepare(event)
-    elif event.payload['type'] == 'prepare':
-        return prepare(event)
-    elif event.payload['type'] == 'commit':
-        return commit(event)
-    elif event.payload['type'] == 'timeout':
-        return timeout(event)
-    elif event.payload['type'] == 'new_block':
-        return new_block(event)
-    else:
-        return 'unhadled'
+    return dispatch(event)
 
 ########################## PROTOCOL COMMUNICATION ###########################
 
@@ -142,12 +135,12 @@ def validate_message(event, node):
 #     # if node in self.validators:
 #         # This node is a validator, so its vote is counted
 #         # Process the vote as usual...
-#         node.state.cp_state.msgs[type] += [sender.id]
+#         node.state.cp_state.msgs[type] = Quorum.add(node.state.cp_state.msgs[type], sender.id)
 def process_vote(node, type, sender):
     # PBFT does not allow for mutliple blocks to be submitted in 1 round
     if node.validator or sender.id==node.id:
         # if node is a validator count vote
-        node.state.cp_state.msgs[type] += [sender.id]
+        node.state.cp_state.msgs[type] = Quorum.add(node.state.cp_state.msgs[type], sender.id)
 
 def pre_prepare(event):
     node = event.receiver
@@ -155,16 +148,16 @@ def pre_prepare(event):
     state = node.state.cp_state
     block = event.payload['block']
     
-    time += Parameters.execution["msg_val_delay"]
+    time += Parameters.config.msg_val_delay
 
     # if node is a new round state (i.e waiting for a new block to be proposed)
     if state.state == 'new_round':
         # validate block
         if block.depth - 1 == node.last_block.depth and block.extra_data["round"] == state.round.round:
-            time += Parameters.execution["block_val_delay"]
+            time += Parameters.config.block_val_delay
 
             # store block as current block
-            state.block = event.payload['block'].copy()
+            state.block = event.payload['block']
             block = state.block
 
             # change state to pre_prepared since block was accepted
@@ -201,14 +194,14 @@ def prepare(event):
     if not validate_message(event, node):
         return "invalid"
     
-    time += Parameters.execution["msg_val_delay"]
+    time += Parameters.config.msg_val_delay
 
     if state.state == 'pre_prepared':
         # count prepare votes from other nodes
         process_vote(node, 'prepare', event.creator)
 
         # if we have enough prepare messages (2f messages since leader does not participate || has allread 'voted')
-        if len(state.msgs['prepare']) == Parameters.application["required_messages"] - 1:
+        if Quorum.count(state.msgs['prepare']) == Parameters.config.required_messages - 1:
             # change to prepared
             state.state = 'prepared'
 
@@ -239,14 +232,14 @@ def prepare(event):
 
         # if we have enough prepare messages (2f - 2 messages since we trust our self so that makes it 2f (leader does not participate))
         # in the case where the node has entered rounch switch we do not count our own vote then 2f - 2 for prepare
-        if len(state.msgs['prepare']) >= Parameters.application["required_messages"] - 2:
-            time += Parameters.execution["block_val_delay"]
+        if Quorum.count(state.msgs['prepare']) >= Parameters.config.required_messages - 2:
+            time += Parameters.config.block_val_delay
 
             if block.depth - 1 == node.last_block.depth:
                 state.round.round = event.payload['round']
 
                 # store block as current block
-                state.block = event.payload['block'].copy()
+                state.block = event.payload['block']
                 block = state.block
 
                 # change state to pre_prepared since block was accepted
@@ -282,17 +275,17 @@ def commit(event):
     node = event.receiver
     time = event.time
     state = node.state.cp_state
-    block = event.payload['block'].copy()
+    block = event.payload['block']
 
     if not validate_message(event, node):
         return "invalid"
-    time += Parameters.execution["msg_val_delay"]
+    time += Parameters.config.msg_val_delay
 
     # if prepared
     if state.state == 'prepared':
         process_vote(node, 'commit', event.creator)
 
-        if len(state.msgs['commit']) >= Parameters.application["required_messages"]:
+        if Quorum.count(state.msgs['commit']) >= Parameters.config.required_messages:
             payload = {
                 'type': 'commit',
                 'block': block,
@@ -330,8 +323,8 @@ def commit(event):
         process_vote(node, 'commit', event.creator)
 
         # if we have enough commit messages (2f messages since we trust our self so that makes it 2f+1)
-        if len(state.msgs['commit']) >= Parameters.application["required_messages"] - 1:
-            time += Parameters.execution["block_val_delay"]
+        if Quorum.count(state.msgs['commit']) >= Parameters.config.required_messages - 1:
+            time += Parameters.config.block_val_delay
 
             if block.depth - 1 == node.last_block.depth:
                 state.round.round = event.payload['round']
@@ -379,16 +372,16 @@ def new_block(event):
 
     if not validate_message(event, node):
         return "invalid"
-    time += Parameters.execution["msg_val_delay"]
+    time += Parameters.config.msg_val_delay
 
-    time += Parameters.execution["block_val_delay"]
+    time += Parameters.config.block_val_delay
 
     # old block (ignore)
-    if block.depth <= node.blockchain[-1].depth:
+    if block.depth <= node.blockchain.height:
         return "invalid"
 
     # future block (sync)
-    elif block.depth > node.blockchain[-1].depth + 1:
+    elif block.depth > node.blockchain.height + 1:
         if node.state.synced:
             node.state.synced = False
             Sync.create_local_sync_event(node, event.creator, time)
@@ -404,6 +397,43 @@ def new_block(event):
         start(node, event.payload['round']+1, time)
         return "handled"
 
+def propose(event):
+    '''
+        leader proposal at block creation time (engine: hybrid) - the round is calculated by FastPath if
+        it is fault free, otherwise the pre_prepare message is broadcast as usual
+    '''
+    node = event.creator
+    state = node.state.cp_state
+
+    if event.payload['round'] != state.round.round or event.payload['block'] is not state.block:
+        return "invalid"
+
+    if not FastPath.try_round(node, state.block, event.time, modules[__name__]):
+        payload = {
+            'type': 'pre_prepare',
+            'block': state.block,
+            'round': state.round.round,
+        }
+
+        node.scheduler.schedule_broadcast_message(
+            node, event.time, payload, handle_event)
+
+    return "handled"
+
+def fast_commit(event):
+    '''
+        commit of a round calculated by FastPath (replaces the prepare/commit messages of the round)
+    '''
+    node = event.creator
+    time = event.time
+
+    if not FastPath.valid(event) or event.payload['round'] != node.state.cp_state.round.round:
+        return "invalid"
+
+    node.add_block(event.payload['block'], time)
+    start(node, event.payload['round'] + 1, time)
+    return "new_state"
+
 ########################## ROUND CHANGE ###########################
 
 def init_round_chage(node, time):
@@ -415,6 +445,7 @@ def start(node, new_round, time):
         return 0
 
     state = node.state.cp_state
+    FastPath.note_start(node, time)
 
     state.state = 'new_round'
     node.backlog = []
@@ -428,7 +459,7 @@ def start(node, new_round, time):
 
     if state.miner == node.id:
         # taking into account block interval for the propossal round timeout
-        schedule_timeout(node, Parameters.data["block_interval"] + time)
+        schedule_timeout(node, Parameters.config.block_interval + time)
 
         block, creation_time = create_PBFT_block(node, time)
 
@@ -437,19 +468,24 @@ def start(node, new_round, time):
             return 0
 
         state.state = 'pre_prepared'
-        state.block = block.copy()
+        state.block = block
         
-        payload = {
-            'type': 'pre_prepare',
-            'block': block,
-            'round': new_round,
-        }   
+        if FastPath.active():
+            # hybrid engine: the leader decides at creation time if the round can be calculated (see FastPath)
+            node.scheduler.schedule_event(
+                node, creation_time, {'type': 'propose', 'block': block, 'round': new_round}, handle_event)
+        else:
+            payload = {
+                'type': 'pre_prepare',
+                'block': block,
+                'round': new_round,
+            }
 
-        node.scheduler.schedule_broadcast_message(
-            node, creation_time, payload, handle_event)
+            node.scheduler.schedule_broadcast_message(
+                node, creation_time, payload, handle_event)
     else:
         # taking into account block interval for the propossal round timeout
-        schedule_timeout(node, Parameters.data["block_interval"] + time)
+        schedule_timeout(node, Parameters.config.block_interval + time)
 
 ########################## TIMEOUTS ###########################
 
@@ -476,20 +512,17 @@ def timeout(event):
 
 def schedule_timeout(node, time, remove=True, add_time=True):
     if node.state.cp_state.timeout is not None and remove:
-        try:
-            node.remove_event(node.state.cp_state.timeout)
-        except ValueError:
-            pass
+        node.cancel_timer(node.state.cp_state.timeout)
 
     if add_time:
-        time += Parameters.PBFT['timeout']
+        time += Parameters.config.PBFT_timeout
 
     payload = {
         'type': 'timeout',
         'round': node.state.cp_state.round.round,
     }
 
-    event = node.scheduler.schedule_event(node, time, payload, handle_event)
+    event = node.scheduler.schedule_event(node, time, payload, handle_event, queue="timer")
     node.state.cp_state.timeout = event
 
 ########################## RESYNC CP SPECIFIC ACTIONS ###########################
@@ -508,6 +541,18 @@ def resync(node, payload, time):
 ######################### OTHER #################################################
 
 def clean_up(node):
-    for event in node.queue.event_list:
-        if event.payload["CP"] == NAME:
-            node.queue.remove_event(event)
+    '''
+        Invalidates the pending PBFT events of the node in O(1) - they are discarded when they reach the front of the queue
+    '''
+    node.state.cp_epoch += 1
+
+# message / event type -> handler (see Opcodes.Dispatch and handle_event)
+dispatch = Opcodes.Dispatch({
+    'pre_prepare': pre_prepare,
+    'prepare': prepare,
+    'commit': commit,
+    'timeout': timeout,
+    'new_block': new_block,
+    'propose': propose,
+    'fast_commit': fast_commit,
+}, default=lambda event: 'unhadled')
@@ -0,0 +1,46 @@
+'''
+    Bitset based vote bookkeeping (quorum certificates)
+
+    Votes are stored as a single integer where bit i is set when node i has voted.
+    For Nn nodes a set of votes costs ~Nn/8 bytes (instead of a list of ids) and
+    counting votes is a popcount which is compared against Parameters.application["required_messages"]
+'''
+
+EMPTY = 0
+
+def add(votes, node_id):
+    '''
+        returns *votes* with the vote of *node_id* set
+    '''
+    return votes | (1 << node_id)
+
+def remove(votes, node_id):
+    '''
+        returns *votes* with the vote of *node_id* cleared
+    '''
+    return votes & ~(1 << node_id)
+
+def has(votes, node_id):
+    '''
+        True if *node_id* has voted in *votes*
+    '''
+    return (votes >> node_id) & 1 == 1
+
+def count(votes):
+    '''
+        number of votes set (popcount)
+    '''
+    return votes.bit_count()
+
+def voters(votes):
+    '''
+        returns the list of node ids that voted (used for printing/debugging)
+    '''
+    ids = []
+    node_id = 0
+    while votes:
+        if votes & 1:
+            ids.append(node_id)
+        votes >>= 1
+        node_id += 1
+    return ids
@@ -1,25 +1,28 @@
 '''
     Hanldes the logic for consensus rounds
 '''
-from types import SimpleNamespace
 from Chain.Parameters import Parameters
 
-def round_change_state(round=0):
+import Chain.Consensus.Quorum as Quorum
+import Chain.Opcodes as Opcodes
+from Chain.NodeTable import NodeTable
+
+def round_change_state(round=0, node=None):
     '''
-        Rounc chage state
+        Rounc chage state (of *node* - stored in the NodeTable for table nodes)
     '''
     state = {
         'round': round,
         'change_to': -1,
-        'votes': {},
+        'votes': {}, # round -> bitset of voters (see Quorum)
     }
-    return SimpleNamespace(**state)
+    return NodeTable.round_state(node, **state)
 
 def state_to_string(node):
     '''
         returns the state of *node* as a string
     '''
-    s = f"round: {node.state.cp_state.round.round} | change_to: {node.state.cp_state.round.change_to} | round_votes: {node.state.cp_state.round.votes}"
+    s = f"round: {node.state.cp_state.round.round} | change_to: {node.state.cp_state.round.change_to} | round_votes: { {r: Quorum.voters(v) for r, v in node.state.cp_state.round.votes.items()} }"
     return s
 
 def reset_votes(node):
@@ -32,8 +35,7 @@ def handle_event(event):
     '''
         handles round change events
     '''
-    if event.payload['type'] == "round_change":
-        handle_round_change_msg(event)
+    dispatch(event)
 
 def change_round(node, time):
     '''
@@ -69,11 +71,11 @@ def handle_round_change_msg(event):
     if ret := count_round_change_vote(node, new_round, event.creator) == 'invalid':
         return ret
 
-    if (len(msgs[new_round]) == Parameters.application["f"]+1) and (new_round > state.round.change_to):
+    if (Quorum.count(msgs[new_round]) == Parameters.config.f+1) and (new_round > state.round.change_to):
         state.state = 'round_change'
         state.round.change_to = new_round
 
-    if len(msgs[new_round]) == Parameters.application["required_messages"] - 1:
+    if Quorum.count(msgs[new_round]) == Parameters.config.required_messages - 1:
         # if a node receives enough round messages to change round and has not send a round change message in the past
         # send message (the node wants to change round since majority wants to change round)
         state.round.change_to == new_round
@@ -87,7 +89,7 @@ def get_next_round(node):
     change_msgs = node.state.cp_state.round.votes
 
     new_round_candidates = [
-        x for x in change_msgs.items() if len(x[1]) >= Parameters.application["f"]]
+        x for x in change_msgs.items() if Quorum.count(x[1]) >= Parameters.config.f]
 
     if new_round_candidates:
         largest_proposed = max(new_round_candidates, key=lambda x: x[0])[0]
@@ -102,16 +104,18 @@ def count_round_change_vote(node, new_round, voter):
 
     for key in msgs:
         # check if the voter has voted for some other round
-        if any([x == voter for x in msgs[key]]):
+        if Quorum.has(msgs[key], voter.id):
             if key < new_round:  # if the voter voted for a smaller round then vote is removed from that
-                msgs[key].remove(voter)
+                msgs[key] = Quorum.remove(msgs[key], voter.id)
             else:  # else vote is not valid
                 return 'invalid'
 
     # count vote
-    if new_round in msgs.keys():
-        msgs[new_round] += [voter]
-    else:
-        msgs[new_round] = [voter]
+    msgs[new_round] = Quorum.add(msgs.get(new_round, Quorum.EMPTY), voter.id)
 
     return "handled"
+
+# message type -> handler (see Opcodes.Dispatch)
+dispatch = Opcodes.Dispatch({
+    'round_change': handle_round_change_msg,
+}, default=lambda event: None)
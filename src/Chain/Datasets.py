@@ -0,0 +1,112 @@
+'''
+    Binary cache of the NetworkLatencies datasets (Network.parse_latencies / Network.parse_distances)
+
+    The JSON datasets are {location: {location: value}} maps. They are converted once into
+        NetworkLatencies/cache/<dataset>/locations.npy   location names (in the order of the JSON keys)
+        NetworkLatencies/cache/<dataset>/<matrix>.npy    float32 matrices indexed by location index
+    and loaded memory mapped (read-only) - every simulation in a sweep (and every worker process, see Runner)
+    shares the same pages instead of parsing the JSON and building nested dicts.
+
+    The cache is rebuilt when the JSON file is newer than it. A dataset can also be provided directly as the
+    cache files (no JSON) - e.g. city sets that are too large to store as JSON.
+
+    Example (from src/):
+        python -m Chain.Datasets    # converts every dataset
+'''
+import json
+import os
+
+from types import SimpleNamespace
+
+import numpy as np
+
+DIRECTORY = "NetworkLatencies"
+CACHE = os.path.join(DIRECTORY, "cache")
+
+# dataset -> (JSON file, matrices: a value of the JSON map is a number or a list of one number per matrix)
+DATASETS = {
+    "latency": ("latency_map.json", ("mean_ms", "dev_ms")),
+    "distance": ("point_distances_km.json", ("km",)),
+}
+
+_loaded = {}
+
+def path(name, file):
+    return os.path.join(CACHE, name, file + ".npy")
+
+def stale(name):
+    '''
+        True if the cache of dataset *name* is missing or older than its JSON file
+    '''
+    source = os.path.join(DIRECTORY, DATASETS[name][0])
+    target = path(name, "locations")
+
+    if not os.path.exists(target):
+        return True
+
+    return os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(target)
+
+def convert(name):
+    '''
+        Converts the JSON dataset *name* into the cache (missing pairs are nan)
+    '''
+    file, matrices = DATASETS[name]
+    with open(os.path.join(DIRECTORY, file), "rb") as f:
+        data = json.load(f)
+
+    locations = list(data.keys())
+    index = {loc: i for i, loc in enumerate(locations)}
+
+    values = np.full((len(matrices), len(locations), len(locations)), np.nan, dtype=np.float32)
+    for s, row in data.items():
+        for r, value in row.items():
+            values[:, index[s], index[r]] = value
+
+    os.makedirs(os.path.join(CACHE, name), exist_ok=True)
+
+    # written to temporary files and renamed (workers may load the dataset while it is converted)
+    # locations last: it marks the cache as up to date
+    arrays = dict(zip(matrices, values))
+    arrays["locations"] = np.array(locations)
+    for file, array in arrays.items():
+        tmp = path(name, f"{file}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path(name, file))
+
+def prepare():
+    '''
+        Converts the stale datasets - called before starting worker processes so they only read the cache
+    '''
+    for name in DATASETS:
+        if stale(name) and os.path.exists(os.path.join(DIRECTORY, DATASETS[name][0])):
+            convert(name)
+
+def load(name):
+    '''
+        Dataset *name* as a SimpleNamespace:
+            locations: location names, index: {location: index}, one read-only matrix per DATASETS entry
+
+        loaded once per process (memory mapped)
+    '''
+    if name in _loaded:
+        return _loaded[name]
+
+    if stale(name):
+        convert(name)
+
+    locations = np.load(path(name, "locations")).tolist()
+    dataset = SimpleNamespace(
+        locations=locations,
+        index={loc: i for i, loc in enumerate(locations)},
+    )
+    for matrix in DATASETS[name][1]:
+        setattr(dataset, matrix, np.load(path(name, matrix), mmap_mode="r"))
+
+    _loaded[name] = dataset
+    return dataset
+
+if __name__ == "__main__":
+    for name in DATASETS:
+        convert(name)
+        print(name, len(load(name).locations), "locations")
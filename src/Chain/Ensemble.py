@@ -0,0 +1,179 @@
+'''
+    Monte Carlo ensemble of the abstract (round level) consensus model
+
+    Instead of running R independent simulations (Runner) the R replicas of a configuration are evaluated in
+    lockstep as NumPy arrays of shape (R, Nn): every replica draws its own node locations and bandwidths
+    (as Network.assign_location_to_nodes / Network.set_bandwidths) and its rounds are calculated with the
+    order statistics model of Consensus/FastPath (FastPath.round_model) - no events are simulated.
+
+    The model assumes every round is fault free (no crashes, byzantine nodes, timeouts or round changes) over a
+    broadcast network - it gives the latency / throughput distribution of the configuration, the message level
+    simulation (Runner) is still needed for faults and other network types.
+
+    Example (from src/):
+        result = Ensemble.run({"cp": "PBFT", "Nn": 10, "alpha": 1}, replicas=500, seed=1)
+        result["summary"]["Average Latency"]   # {"mean": ..., "ci": 95% CI half width}
+
+    Per replica metrics follow Metrics (averaged over the nodes):
+        Average Latency: mean (over blocks) of the mean confirmation latency of the transactions of the block
+        Average Throughput: committed transactions / simTime
+        Average CP Messages: messages sent + received / simTime
+'''
+import math
+from types import SimpleNamespace
+
+import numpy as np
+
+import Chain.Runner as Runner
+import Chain.Consensus.FastPath as FastPath
+from Chain.SteadyState import t_95
+
+METRICS = ("Average Latency", "Average Throughput", "Average CP Messages", "Blocks")
+
+def block_capacity():
+    '''
+        number of transactions per block (TransactionFactory.execute_transactions - fixed size transactions)
+    '''
+    from Chain.Parameters import Parameters
+
+    count, size = 0, 0
+    while size + Parameters.application["Tsize"] <= Parameters.data["Bsize"]:
+        size += Parameters.application["Tsize"]
+        count += 1
+
+    return count
+
+def timestamp_sum(ids, Tn):
+    '''
+        sum of the timestamps of transactions 0..ids-1 (Tn transactions generated per second)
+    '''
+    q, r = ids // Tn, ids % Tn
+    return Tn * q * (q - 1) / 2 + q * r
+
+def run(params, replicas, seed=None):
+    '''
+        Evaluates *replicas* replicas of the configuration (loaded config + *params*, see Runner.configure)
+
+        returns {metric: per replica values (numpy array)} and "summary": {metric: {"mean", "ci"}}
+    '''
+    from Chain.Parameters import Parameters
+    from Chain.Network import Network
+
+    Runner.configure(params)
+
+    name = Parameters.simulation["init_CP"]
+    Nn = Parameters.application["Nn"]
+    Tn = Parameters.application["Tn"]
+    simTime = Parameters.simulation["simTime"]
+    bandwidth = Parameters.network["bandwidth"]
+
+    if Nn < 3 or (name == "PBFT" and Parameters.application["required_messages"] < 3):
+        raise ValueError("the round model needs Nn >= 3 (PBFT: required_messages >= 3)")
+
+    rng = np.random.default_rng(seed)
+    R = replicas
+
+    Network.parse_latencies()
+    Network.parse_distances()
+    Network.location_table = None
+    propagation = Network.location_delays()
+
+    # per replica network (R, Nn) -> pairwise delays (R, Nn, Nn)
+    locations = rng.integers(len(Network.locations), size=(R, Nn))
+    if bandwidth["debug"]:
+        bandwidths = np.ones((R, Nn))
+    else:
+        bandwidths = rng.normal(bandwidth["mean"], bandwidth["dev"], size=(R, Nn))
+
+    propagation = propagation[locations[:, :, None], locations[:, None, :]]
+    link_bandwidth = np.minimum(bandwidths[:, :, None], bandwidths[:, None, :])
+    fixed = Parameters.network["queueing_delay"] + Parameters.network["processing_delay"]
+
+    capacity = block_capacity()
+    rows = np.arange(R)
+
+    # state of every replica
+    starts = np.zeros((R, Nn))
+    included = np.zeros(R, dtype=np.int64)
+    round = 0
+
+    blocks = np.zeros((R, Nn), dtype=np.int64)
+    txs = np.zeros((R, Nn), dtype=np.int64)
+    latency_sum = np.zeros((R, Nn))
+    messages = np.zeros((R, Nn))
+
+    active = np.ones(R, dtype=bool)
+    while active.any():
+        if name == "PBFT":
+            leader = np.full(R, round % Nn)
+        else:
+            # miner from the (random) id of the last block
+            leader = rng.integers(1, 10001, size=R) % Nn
+
+        # block creation - waits (1s steps) for transactions if the pool is empty
+        creation = starts[rows, leader] + Parameters.data["block_interval"] + Parameters.execution["creation_time"]
+        available = Tn * (np.floor(creation) + 1) - included
+        creation = np.where(available > 0, creation, creation + 1)
+        available = Tn * (np.floor(creation) + 1) - included
+
+        count = np.minimum(available, capacity).astype(np.int64)
+        block_size = count * Parameters.application["Tsize"]
+
+        def delays(type):
+            size = Network.size(SimpleNamespace(payload={'type': type, 'block': SimpleNamespace(size=0), 'round': round, 'CP': name}))
+            return (size + block_size)[:, None, None] / link_bandwidth + propagation + fixed
+
+        model = FastPath.round_model(name, creation, leader, delays)
+        commit_times = model.commit_times
+
+        # only commits within simTime are counted (replicas past simTime are finished)
+        counted = active[:, None] & (commit_times <= simTime)
+        mean_timestamp = (timestamp_sum(included + count, Tn) - timestamp_sum(included, Tn)) / np.maximum(count, 1)
+
+        blocks += counted
+        txs += np.where(counted, count[:, None], 0)
+        latency_sum += np.where(counted, commit_times - mean_timestamp[:, None], 0)
+
+        # broadcasts sent within simTime (each reaches the other Nn - 1 nodes)
+        is_leader = leader[:, None] == np.arange(Nn)
+        sent = np.where(is_leader, creation[:, None] <= simTime, model.prepare_times <= simTime).astype(np.int64)
+        if name == "PBFT":
+            sent += (model.prepared <= simTime) + 2 * (~model.shortcut & (model.committed <= simTime))
+        sent[~active] = 0
+        messages += sent * (Nn - 1) + sent.sum(axis=-1, keepdims=True) - sent
+
+        included += count
+        starts = commit_times
+        active &= commit_times.min(axis=-1) <= simTime
+        round += 1
+
+    with np.errstate(invalid="ignore"):
+        latency = (latency_sum / blocks).mean(axis=1)
+
+    result = {
+        "Average Latency": latency,
+        "Average Throughput": (txs / simTime).mean(axis=1),
+        "Average CP Messages": (messages / simTime).mean(axis=1),
+        "Blocks": blocks.max(axis=1),
+    }
+    result["summary"] = {metric: summary(result[metric]) for metric in METRICS}
+    result["replicas"] = R
+    result.update(params)
+    result["seed"] = seed
+
+    return result
+
+def summary(values):
+    '''
+        mean and 95% CI half width of the replica *values* (nan replicas are ignored)
+    '''
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+
+    if len(values) < 2:
+        return {"mean": float(values.mean()) if len(values) else math.nan, "ci": math.nan}
+
+    return {
+        "mean": float(values.mean()),
+        "ci": t_95(len(values) - 1) * float(values.std(ddof=1)) / math.sqrt(len(values)),
+    }
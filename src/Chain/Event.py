@@ -1,5 +1,7 @@
 from random import randint
 
+from Chain.Opcodes import intern
+
 class Event():
     '''
         Models events for the descrete event simulation
@@ -44,8 +46,13 @@ class Event():
         self.creator = creator
         self.time = time
         self.payload = payload
+        self.op = intern(payload["type"])
 
         self.actor = creator
+
+        # epochs of the actor when the event was scheduled/delivered (None: not checked) - see Node.is_stale
+        self.cp_epoch = None
+        self.live_epoch = None
     
     def to_serializable(self):
         return {
@@ -118,4 +125,5 @@ class SystemEvent():
 
     def __init__(self, time, payload) -> None:
         self.time = time
-        self.payload = payload
\ No newline at end of file
+        self.payload = payload
+        self.op = intern(payload["type"])
\ No newline at end of file
@@ -0,0 +1,185 @@
+import os
+import glob
+from array import array
+
+import numpy as np
+
+from Chain.Parameters import Parameters
+
+def arrow():
+    '''
+        (pyarrow, pyarrow.parquet) or (None, None) if pyarrow is not installed (falls back to numpy .npz chunks)
+        - imported on first use so runs that do not export do not pay for the import
+    '''
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None, None
+
+    return pa, pq
+
+# table -> {column: array typecode ('' for string columns)}
+TABLES = {
+    "blocks": {
+        "id": 'q', "depth": 'q', "miner": 'q', "consensus": '', "round": 'q',
+        "size": 'd', "transactions": 'q', "time_created": 'd', "time_committed": 'd',
+    },
+    "transactions": {
+        "tx_id": 'q', "block_id": 'q', "depth": 'q', "timestamp": 'd', "time_committed": 'd',
+    },
+    "messages": {
+        "time_sent": 'd', "time_received": 'd', "sender": 'q', "receiver": 'q', "type": '', "round": 'q', "size": 'd',
+    },
+}
+
+class Table:
+    '''
+        Column buffers of one exported table - written out (and cleared) every *chunk_rows* rows
+
+        With pyarrow the chunks are row groups of <dir>/<run>_<name>.parquet,
+        otherwise each chunk is written to <dir>/<run>_<name>.<chunk>.npz
+    '''
+    def __init__(self, name, path, chunk_rows):
+        self.name = name
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.columns = TABLES[name]
+
+        self.chunks = 0
+        self.writer = None
+        self.clear()
+
+    def __len__(self):
+        return self.rows
+
+    def clear(self):
+        self.data = {c: array(t) if t else [] for c, t in self.columns.items()}
+        self.rows = 0
+
+    def append(self, *row):
+        for column, value in zip(self.data.values(), row):
+            column.append(value)
+
+        self.rows += 1
+        if self.rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows == 0:
+            return
+
+        pa, pq = arrow()
+        if pa is not None:
+            table = pa.table({c: pa.array(np.asarray(v) if self.columns[c] else v) for c, v in self.data.items()})
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(f"{self.path}.parquet", table.schema)
+            self.writer.write_table(table)
+        else:
+            np.savez(f"{self.path}.{self.chunks}.npz", **{
+                c: np.frombuffer(v, dtype=v.typecode) if self.columns[c] else np.asarray(v, dtype=str)
+                for c, v in self.data.items()
+            })
+
+        self.chunks += 1
+        self.clear()
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+class Export:
+    '''
+        Columnar export of a run (Parameters.simulation["export"]) - written in chunks during the run
+
+        blocks: every block the first time it's committed (added to the chain of any node)
+        transactions: transaction inclusions (transaction -> block) of the committed blocks
+        messages: every message sent (optional - large)
+
+        Export.load(table) reads the tables of a run back as {column: numpy array} (Export.dataframe: pandas DataFrame)
+    '''
+    enabled = False
+    messages = False
+    tables = {}
+
+    @staticmethod
+    def init():
+        params = Parameters.simulation["export"]
+
+        Export.enabled = params["enabled"]
+        # messages are only recorded when the export is enabled (see Network.message)
+        Export.messages = Export.enabled and params["messages"]
+        Export.tables = {}
+
+        if not Export.enabled:
+            return
+
+        os.makedirs(params["dir"], exist_ok=True)
+        for name in TABLES:
+            path = os.path.join(params["dir"], f"{params['run']}_{name}")
+
+            # tables of an earlier run with the same prefix (Export.load would mix its chunks in)
+            for old in glob.glob(f"{glob.escape(path)}.*.npz") + glob.glob(f"{glob.escape(path)}.parquet"):
+                os.remove(old)
+
+            if name == "messages" and not Export.messages:
+                continue
+            Export.tables[name] = Table(name, path, params["chunk_rows"])
+
+    @staticmethod
+    def note_block(block, time):
+        '''
+            exports the committed *block* and its transactions (see Node.note_first_commit)
+        '''
+        Export.tables["blocks"].append(
+            block.id, block.depth, block.miner if block.miner is not None else -1,
+            block.consensus.NAME if block.consensus is not None else "",
+            block.extra_data.get("round", -1), block.size, len(block.transactions), block.time_created, time
+        )
+
+        transactions = Export.tables["transactions"]
+        for tx in block.transactions:
+            transactions.append(tx.id, block.id, block.depth, tx.timestamp, time)
+
+    @staticmethod
+    def note_message(msg, sender, receiver, time_sent, size):
+        round = msg.payload.get("round", -1)
+        Export.tables["messages"].append(
+            time_sent, msg.time, sender.id, receiver.id, msg.payload["type"], round if isinstance(round, int) else -1, size
+        )
+
+    @staticmethod
+    def close():
+        for table in Export.tables.values():
+            table.close()
+
+    @staticmethod
+    def load(table, dir=None, run=None):
+        '''
+            returns the exported *table* ({column: numpy array}) of *run* (defaults to the configured dir/run)
+        '''
+        if dir is None or run is None:
+            params = Parameters.simulation["export"]
+            dir = params["dir"] if dir is None else dir
+            run = params["run"] if run is None else run
+        path = os.path.join(dir, f"{run}_{table}")
+
+        pa, pq = arrow()
+        if os.path.exists(f"{path}.parquet") and pq is not None:
+            data = pq.read_table(f"{path}.parquet")
+            return {c: data.column(c).to_numpy() for c in data.column_names}
+
+        chunks = sorted(glob.glob(f"{path}.*.npz"), key=lambda x: int(x.rsplit(".", 2)[1]))
+        loaded = [np.load(chunk) for chunk in chunks]
+        return {c: np.concatenate([chunk[c] for chunk in loaded]) for c in TABLES[table]} if loaded else {}
+
+    @staticmethod
+    def dataframe(table, dir=None, run=None):
+        '''
+            Export.load as a pandas DataFrame (pandas is only imported here)
+        '''
+        import pandas as pd
+
+        return pd.DataFrame(Export.load(table, dir, run))
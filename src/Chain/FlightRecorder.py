@@ -0,0 +1,113 @@
+import os
+import signal
+
+from Chain.Parameters import Parameters
+
+class FlightRecorder:
+    '''
+        Always-on, fixed memory ring buffer of the last handled events (post-mortem inspection of long runs)
+
+        Each handled event is stored as a compact tuple:
+            (time, actor, type, round, return code of the handler)
+
+        The buffer is written to Parameters.simulation["flight_recorder"]["path"] ({pid} is replaced by the
+        process id so parallel runs - see Runner - do not write to the same file):
+            - when the simulation raises an exception (Manager.run)
+            - when no block is added for "stall" simulated seconds (0: never)
+            - on demand: FlightRecorder.dump(), the 'dump' debug command or SIGUSR1
+
+        size 0 disables the recorder.
+    '''
+    records = []
+    size = 0
+    next = 0
+    total = 0
+
+    last_block_time = 0
+    stall = 0
+    path = None
+
+    clock = 0
+
+    @staticmethod
+    def init():
+        params = Parameters.simulation["flight_recorder"]
+
+        FlightRecorder.size = params["size"]
+        FlightRecorder.records = [None] * FlightRecorder.size
+        FlightRecorder.next = 0
+        FlightRecorder.total = 0
+
+        FlightRecorder.last_block_time = 0
+        FlightRecorder.stall = params["stall"]
+        FlightRecorder.path = params["path"].format(pid=os.getpid())
+
+    @staticmethod
+    def record(time, actor, type, round, ret):
+        if not FlightRecorder.size:
+            return
+        FlightRecorder.records[FlightRecorder.next] = (time, actor, type, round, ret)
+        FlightRecorder.next = (FlightRecorder.next + 1) % FlightRecorder.size
+        FlightRecorder.total += 1
+
+    @staticmethod
+    def record_event(event, ret):
+        FlightRecorder.record(event.time, event.actor.id, event.payload["type"], event.payload.get("round"), ret)
+
+    @staticmethod
+    def note_block(time):
+        FlightRecorder.last_block_time = time
+
+    @staticmethod
+    def check_stall(clock):
+        '''
+            Dumps the buffer if no block was added in the last *stall* simulated seconds
+            (once per stall window)
+        '''
+        FlightRecorder.clock = clock
+
+        if FlightRecorder.stall and clock - FlightRecorder.last_block_time > FlightRecorder.stall:
+            FlightRecorder.dump(f"stall: no block added since {round(FlightRecorder.last_block_time, 3)}")
+            FlightRecorder.last_block_time = clock
+
+    @staticmethod
+    def last(num=None):
+        '''
+            returns the stored records (oldest first) - if num is given only the last num
+        '''
+        if FlightRecorder.total < FlightRecorder.size:
+            records = FlightRecorder.records[:FlightRecorder.next]
+        else:
+            records = FlightRecorder.records[FlightRecorder.next:] + FlightRecorder.records[:FlightRecorder.next]
+
+        return records if num is None else records[-num:]
+
+    @staticmethod
+    def dump(reason="on demand", path=None):
+        '''
+            Appends the contents of the buffer to *path* (defaults to the configured path)
+        '''
+        path = FlightRecorder.path if path is None else path
+
+        with open(path, "a") as f:
+            f.write(f"---------- FLIGHT RECORDER: {reason} | clock: {round(FlightRecorder.clock, 3)} | events handled: {FlightRecorder.total} ----------\n")
+            f.write("time\tactor\ttype\tround\tret\n")
+            for time, actor, type, round_, ret in FlightRecorder.last():
+                f.write(f"{round(time, 3)}\t{actor}\t{type}\t{round_}\t{ret}\n")
+
+        return path
+
+    @staticmethod
+    def install_signal_handler():
+        '''
+            Dump on SIGUSR1 (i.e kill -USR1 <pid>) - only available on POSIX from the main thread
+        '''
+        if not hasattr(signal, "SIGUSR1"):
+            return False
+
+        try:
+            signal.signal(signal.SIGUSR1, lambda signum, frame: FlightRecorder.dump("SIGUSR1"))
+        except ValueError:
+            return False
+
+        return True
@@ -4,10 +4,12 @@ from Chain.Parameters import Parameters
 from Chain.Network import Network
 
 import Chain.tools as tools
+import Chain.Opcodes as Opcodes
 
 from Chain.Event import Event, MessageEvent
 
 from Chain.Metrics import SimulationState
+from Chain.FlightRecorder import FlightRecorder
 
 '''
     Handling and running Events
@@ -27,27 +29,29 @@ def handle_event(event, backlog=True):
 
     SimulationState.store_event(event)
 
-    if event.payload["type"] in Parameters.simulation["events"].keys():
-        Parameters.simulation["events"][event.payload["type"]] += 1
-    else:
-        Parameters.simulation["events"][event.payload["type"]] = 1
-        
+    Opcodes.counts[event.op] += 1
+
     # if node is dead - event will not be handled
     if not event.actor.state.alive:
+        FlightRecorder.record_event(event, 'dead_node')
         return 'dead_node'
     
     # if this event is CP specific and the CP of the event does not mactch the current CP - old message
     if "CP" in event.payload and event.payload['CP'] != event.actor.state.cp.NAME:
+        FlightRecorder.record_event(event, 'invalid')
         return 'invalid'
 
     # if network mode is gossip - the node will mutlticast message to it's neighbours
     # backlog since we don't want want to multicast when cheking backlog
-    if Parameters.network["type"]=="gossip" and backlog and isinstance(event, MessageEvent):
+    # (analytic gossip already scheduled the deliveries to every node - see Network.flood)
+    if Parameters.config.relay and backlog and isinstance(event, MessageEvent):
         Network.multicast(event.actor, event)
 
     # handlle event using it's respective handler
     ret = event.handler(event)
 
+    FlightRecorder.record_event(event, ret)
+
     # add event to backlog
     # if backloged event (when backlog == False) returns backlog -> still future event)
     if ret == 'backlog' and backlog:
@@ -66,12 +70,14 @@ def handle_backlog(node):
     remove_list = []
 
     for event in node.backlog:
-        tools.debug_logs(
-            msg=f"{node.__str__(full=True)}", input=f"HANDLING BACKLOOOG: {event} ", in_col="43", clear=False)
+        if tools.DEBUG_LEVEL >= tools.TRACE_FULL:
+            tools.debug_logs(
+                msg=lambda: node.__str__(full=True), level=tools.TRACE_FULL, input=f"HANDLING BACKLOOOG: {event} ", in_col="43", clear=False)
 
         ret = handle_event(event, backlog=False)
 
-        tools.debug_logs(msg=f"event returned {ret}")
+        if tools.DEBUG_LEVEL >= tools.TRACE_FULL:
+            tools.debug_logs(msg=f"event returned {ret}", level=tools.TRACE_FULL)
         
         if ret == 'handled' or ret == 'new_state' or ret == 'invalid':
             remove_list.append(event)
@@ -0,0 +1,67 @@
+from array import array
+from bisect import bisect_right
+
+class Ledger:
+    '''
+        Append only columnar storage for the local blockchain of a node (indexed by depth)
+
+        blocks: references to the (shared) Block objects
+        ids: block ids
+        depths: block depths (non-decreasing - blocks are only appended on top of the chain)
+        sizes: block sizes
+        times_added: time each block was added to the chain of this node
+
+        Supports the list operations used on node.blockchain (len, indexing, slicing, iteration)
+        Last block/height lookups are O(1) and "blocks above depth d" is an O(k) slice
+    '''
+    def __init__(self):
+        self.blocks = []
+        self.ids = array('q')
+        self.depths = array('q')
+        self.sizes = array('d')
+        self.times_added = array('d')
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __getitem__(self, index):
+        return self.blocks[index]
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def __repr__(self):
+        return f"Ledger: {len(self.blocks)} blocks (height {self.height})"
+
+    @property
+    def last(self):
+        return self.blocks[-1]
+
+    @property
+    def height(self):
+        return self.depths[-1]
+
+    def append(self, block, time):
+        self.blocks.append(block)
+        self.ids.append(block.id)
+        self.depths.append(block.depth)
+        self.sizes.append(block.size)
+        self.times_added.append(time)
+
+    def index_above(self, depth):
+        '''
+            index of the first block with depth > *depth*
+        '''
+        # blocks are normally stored contiguously by depth so the index can be calculated directly
+        idx = depth + 1 - self.depths[0]
+        if 0 < idx < len(self.depths) and self.depths[idx] == depth + 1 and self.depths[idx-1] == depth:
+            return idx
+
+        return bisect_right(self.depths, depth)
+
+    def above(self, depth):
+        '''
+            returns the blocks (and the times they were added) with depth > *depth*
+        '''
+        idx = self.index_above(depth)
+        return self.blocks[idx:], self.times_added[idx:]
@@ -2,12 +2,20 @@ from Chain.Simulation import Simulation
 from Chain.Parameters import Parameters
 from Chain.Network import Network
 from Chain.Node import Node
+from Chain.NodeTable import NodeTable
 from Chain.Event import SystemEvent
+from Chain.FlightRecorder import FlightRecorder
+from Chain.SteadyState import SteadyState
+from Chain.TimeSeries import TimeSeries
+from Chain.Telemetry import Telemetry
+from Chain.Export import Export
 
 import Chain.Consensus.BigFoot.BigFoot as BigFoot
 import Chain.Consensus.PBFT.PBFT as PBFT
+import Chain.Consensus.FastPath as FastPath
 
 import Chain.tools as tools
+import Chain.Opcodes as Opcodes
 
 import Chain.Consensus.HighLevelSync as Sync
 
@@ -32,6 +40,16 @@ class Manager:
     def __init__(self) -> None:
         self.sim = None
         self.behaviour = None
+        self.start_debug = None
+
+        # system event type -> handler (see Opcodes.Dispatch)
+        self.dispatch = Opcodes.Dispatch({
+            "apply_behavior": self.handle_apply_behavior_event,
+            "node fault": self.handle_node_fault_event,
+            "node recovery": self.handle_node_recovery_event,
+            "generate_txions": self.handle_generate_txions_event,
+            "change_cp": self.handle_change_cp_event,
+        }, default=lambda event: None)
 
 
     def set_up(self):
@@ -48,6 +66,9 @@ class Manager:
         # initialise network
         Network.init_network(self.sim.nodes) 
 
+        # time (if any) at which debugging starts (read once - see tools.set_env_vars_from_config)
+        self.start_debug = int(os.environ['start_debug']) if 'start_debug' in os.environ else None
+
         # initialise behaviour module
         self.behaviour = Behaiviour(self.sim)
 
@@ -103,9 +124,10 @@ class Manager:
         if isinstance(cp, str):
             cp = CPs[cp]
 
-        tools.debug_logs(msg=f"WILL CHANGE CP TO {cp.NAME}", input="RETURN TO CONFIRM...", col=42)
+        tools.debug_logs(msg=lambda: f"WILL CHANGE CP TO {cp.NAME}", input="RETURN TO CONFIRM...", col=42)
 
         Parameters.application["CP"] = cp
+        TimeSeries.note_marker(self.sim.clock, f"change CP to {cp.NAME}")
     
     def add_node(self):
         '''
@@ -116,8 +138,8 @@ class Manager:
         Parameters.calculate_fault_tolerance()
 
         # create node and gensis block
-        node = Node(self.sim.nodes[-1].id+1)
-        node.add_block(self.sim.nodes[0].blockchain[0].copy(), self.sim.clock)
+        node = Node.create(self.sim.nodes[-1].id+1)
+        node.add_block(self.sim.nodes[0].blockchain[0], self.sim.clock)
         
         # assign a location and neighbours to node
         Network.assign_location_to_nodes(node)
@@ -132,6 +154,10 @@ class Manager:
         self.sim.nodes.append(node) 
         Network.nodes = self.sim.nodes
         
+        # the fast round in flight (if any) and the gossip trees were calculated for the old nodes
+        FastPath.abort(self.sim.clock)
+        Network.topology_changed()
+
         # bring the new node up to date and begin the syncing process
         node.update(self.sim.clock)
         
@@ -147,22 +173,52 @@ class Manager:
         Parameters.calculate_fault_tolerance()
 
         rem_node = self.sim.nodes.pop()
+        if NodeTable.enabled:
+            NodeTable.remove(rem_node)
+        FastPath.abort(self.sim.clock)
+        Network.topology_changed()
 
     def update_sim(self):
         '''
             Time based updates that are not controlled by system events can be triggered here
         '''
         ################ Start debug at time #################
-        if 'start_debug' in os.environ and int(os.environ['start_debug']) <= self.sim.clock:
-            os.environ['debug'] = "True"
+        if self.start_debug is not None and self.start_debug <= self.sim.clock:
+            tools.set_debug("True")
+            self.start_debug = None
+
+        FlightRecorder.check_stall(self.sim.clock)
     
     def run(self):
         ''' Managed simulation loop'''
         self.behaviour.update_behaviour()
 
-        while self.sim.clock <= Parameters.simulation['simTime']:
-            self.sim.sim_next_event()
-            self.update_sim()
+        FlightRecorder.install_signal_handler()
+
+        try:
+            while self.sim.clock <= Parameters.simulation['simTime']:
+                self.sim.sim_next_event()
+                self.update_sim()
+
+                if Telemetry.enabled:
+                    Telemetry.tick(self.sim)
+
+                if SteadyState.should_stop(self.sim.clock) is not None:
+                    # metrics are normalised by simTime - end the run at the current time
+                    SteadyState.result["simTime"] = Parameters.simulation['simTime']
+                    Parameters.simulation['simTime'] = self.sim.clock
+                    Parameters.compile()
+                    break
+
+            if Telemetry.enabled:
+                Telemetry.publish(self.sim)
+        except Exception as e:
+            # (not on KeyboardInterrupt / SystemExit - a dump can be requested with SIGUSR1)
+            FlightRecorder.dump(f"exception: {e!r}")
+            raise
+        finally:
+            Export.close()
+            Parameters.simulation["events"] = Opcodes.event_counts()
 
     ################################################################################################
                             ################ SYSTEM EVENTS #################
@@ -171,16 +227,9 @@ class Manager:
     def handle_next_event(self):
         event = self.sim.system_queue.pop_next_event()
 
-        if event.payload["type"] == "apply_behavior":
-            self.handle_apply_behavior_event(event)
-        elif event.payload["type"] == "node fault":
-            self.handle_node_fault_event(event)
-        elif event.payload["type"] == "node recovery":
-            self.handle_node_recovery_event(event)
-        elif event.payload["type"] == "generate_txions":
-            self.handle_generate_txions_event(event)
-        elif event.payload["type"] == "change_cp":
-            self.handle_change_cp_event(event)
+        FlightRecorder.record(event.time, "system", event.payload["type"], None, None)
+
+        self.dispatch(event)
 
     ################################################################################################
                             ################ APPLY BEHAVIOUR #################
@@ -252,6 +301,7 @@ class Manager:
 
     def handle_node_fault_event(self, event):
         event.payload["node"].kill()
+        TimeSeries.note_marker(event.time, f"fault {event.payload['node'].id}")
         recovery_time = event.time + expovariate(1/event.payload["node"].behaviour.mean_recovery_time)
         event = SystemEvent(
             time = recovery_time,
@@ -264,6 +314,7 @@ class Manager:
     
     def handle_node_recovery_event(self, event):
         event.payload["node"].resurect()
+        TimeSeries.note_marker(event.time, f"recovery {event.payload['node'].id}")
         event.payload["node"].behaviour.recovery_event = None
         event.payload["node"].behaviour.fault_event = None
 
@@ -328,6 +379,7 @@ class Behaiviour:
 
                 fnode.behaviour.fault_event = event
                 self.sim.system_queue.add_event(event)
+                FastPath.fault_scheduled(next_fault_time)
 
 
 
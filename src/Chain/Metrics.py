@@ -1,8 +1,8 @@
 import pickle
 import statistics as st
 from Chain.Parameters import Parameters
+from Chain.TxLatency import TxLatency
 
-import matplotlib.pyplot as plt
 import numpy as np
 class SimulationState:
     '''
@@ -24,6 +24,11 @@ class SimulationState:
     def load_state(sim):
         pass
 
+    @staticmethod
+    def reset():
+        SimulationState.blockchain_state = {}
+        SimulationState.events = {"consensus":{}, "other": {}}
+
     @staticmethod
     def store_event(event):
         if 'block' in event.payload.keys():
@@ -46,6 +51,13 @@ class Metrics:
     CP={}
     decentralisation = {}
 
+    @staticmethod
+    def reset():
+        Metrics.latency = {}
+        Metrics.throughput = {}
+        Metrics.blocktime = {}
+        Metrics.CP = {}
+        Metrics.decentralisation = {}
     
     @staticmethod
     def measure_all(state):
@@ -106,7 +118,7 @@ class Metrics:
         """
             Measured as:  sum_processed_txions / simTime
 
-            TODO: Measure in intervals (possibly missleading??)
+            NOTE: a single average hides dips (CP changes, faults) - see TimeSeries for per interval throughput
         """
         for node_id, node_state in bc_state.items():
             sum_tx = sum([len(x["transactions"]) for x in node_state["blockchain"]])
@@ -138,6 +150,9 @@ class Metrics:
         Parameters:
             bc_state: The blockchain state data used for calculating variances.
         """
+        # imported here so the simulator does not need matplotlib (headless runs / sweep workers)
+        import matplotlib.pyplot as plt
+
         # Create a new figure with two subplots
         fig, axs = plt.subplots(1, 2, figsize=(15, 5))
 
@@ -229,6 +244,10 @@ class Metrics:
             "CP Messages Variance": st.variance(Metrics.CP.values()) if len(Metrics.CP.values()) > 1 else 0,
         }
 
+        # per transaction confirmation latency percentiles (see TxLatency)
+        for q, latency in TxLatency.percentiles().items():
+            average_metrics[f"Tx Latency p{q}"] = latency
+
         return average_metrics
 
     @staticmethod
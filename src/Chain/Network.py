@@ -1,14 +1,27 @@
 from Chain.Event import MessageEvent
 from Chain.Parameters import Parameters
+from Chain.TimeSeries import TimeSeries
+from Chain.Export import Export
 
 import Chain.tools as tools
+import Chain.Topology as Topology
+import Chain.Datasets as Datasets
+from Chain.NodeTable import NodeTable
 
-import numpy as np, glob, pandas as pd
+import numpy as np
 from sys import getsizeof
 
 import random
+import heapq
 
-import json
+
+# default topology generator of each network type (see Topology)
+TOPOLOGIES = {
+    "gossip": "random",
+    "broadcast": "complete",
+    "smallworld": "random",
+    "lattice": "k_nearest",
+}
 
 class Network:
     '''
@@ -26,16 +39,30 @@ class Network:
      
     nodes: list of BP's
     locations: list of various locations node can be in
-    latency_map: map of propgation latencies between locations
+    latencies: measured latencies between the latency dataset locations (Datasets.load("latency"))
+    distances: distances between the distance dataset locations (Datasets.load("distance"))
     '''
     nodes = None
     locations = None
-    latency_map = None
-    distance_map = None
+    latencies = None
+    distances = None
+
+    # (propagation delay matrix, pairwise bandwidth matrix) of Network.nodes - see delay_matrix
+    matrices = None
+
+    # analytic gossip: (sender id, size class) -> shortest path tree - see flood
+    trees = {}
+
+    # CSR adjacency (indptr, indices) of the generated topology (None: not generated - see assign_neighbours)
+    adjacency = None
+
+    # propagation delays between the dataset locations and the index of each location - see location_delays
+    location_table = None
+    location_index = None
     
     @staticmethod
     def size(msg):
-        size = Parameters.network["base_msg_size"]
+        size = Parameters.config.base_msg_size
 
         for key in msg.payload:
             if key == "block":
@@ -48,14 +75,16 @@ class Network:
     @staticmethod
     def send_message(creator, event):
         with open("metrics.txt", "a") as file:
-            if Parameters.network["type"]=="gossip":
+            if Parameters.config.network_type=="gossip" and Parameters.config.gossip=="analytic":
+                Network.flood(creator, event)
+            elif Parameters.config.network_type=="gossip":
                 Network.multicast(creator, event)
-            elif Parameters.network["type"]=="broadcast":
+            elif Parameters.config.network_type=="broadcast":
                 Network.broadcast(creator, event)
-            elif Parameters.network["type"]=="smallworld":
+            elif Parameters.config.network_type=="smallworld":
                 Network.smallworld_message(creator, event)
                  
-            elif Parameters.network["type"]=="lattice":
+            elif Parameters.config.network_type=="lattice":
                 Network.lattice_message(creator, event)
                  
             else: 
@@ -75,6 +104,78 @@ class Network:
 
         Network.message(sender, receiver, msg)
      
+    @staticmethod
+    def flood(creator, event):
+        '''
+            Analytic gossip (network.gossip: analytic): instead of relaying the message hop by hop (Handler -> multicast)
+            only the first copy each node receives is scheduled. With fixed link delays the first copies travel along
+            the shortest path tree of the neighbour graph (rooted at creator), so every node gets the message from its
+            parent in the tree at parent arrival + link delay.
+
+            Message counts (and exported messages) are the tree deliveries - duplicate copies are not sent.
+            Relays happen through the nodes alive when the message is sent (a node crashing while the message
+            is in flight still relays it).
+        '''
+        size = Network.size(event)
+        arrival = {creator.id: event.time}
+
+        for parent, receiver in Network.shortest_path_tree(creator, size):
+            msg = MessageEvent.from_Event(event, receiver)
+            msg.time = arrival[parent.id]
+            Network.message(parent, receiver, msg)
+            arrival[receiver.id] = msg.time
+
+    @staticmethod
+    def shortest_path_tree(sender, size):
+        '''
+            Dijkstra on the neighbour graph of the alive nodes (edge weights: calculate_message_propagation_delay)
+
+            Returns the (parent, node) edges of the tree in arrival order. Trees are cached per sender and size class
+            (network.gossip_size_class - the weights are calculated for the middle of the class) until the topology
+            changes (Network.topology_changed)
+        '''
+        resolution = Parameters.network["gossip_size_class"]
+        size_class = int(size // resolution)
+
+        key = (sender.id, size_class)
+        if key in Network.trees:
+            return Network.trees[key]
+
+        class_size = (size_class + 0.5) * resolution
+
+        dist = {sender.id: 0}
+        done = set()
+        tree = []
+        heap = [(0, sender.id, sender, None)]
+
+        while heap:
+            d, _, node, parent = heapq.heappop(heap)
+            if node.id in done:
+                continue
+            done.add(node.id)
+
+            if parent is not None:
+                tree.append((parent, node))
+
+            for n in node.neighbours:
+                if n.id in done or not n.state.alive:
+                    continue
+
+                nd = d + Network.calculate_message_propagation_delay(node, n, class_size)
+                if nd < dist.get(n.id, float("inf")):
+                    dist[n.id] = nd
+                    heapq.heappush(heap, (nd, n.id, n, node))
+
+        Network.trees[key] = tree
+        return tree
+
+    @staticmethod
+    def topology_changed():
+        '''
+            called when nodes crash, recover, join or leave (invalidates the cached gossip trees)
+        '''
+        Network.trees = {}
+
     @staticmethod
     def broadcast(node, event):
         for n in Network.nodes:
@@ -84,10 +185,16 @@ class Network:
 
     @staticmethod
     def message(sender, receiver, msg, delay=True):
+        size = Network.size(msg)
         delay = Network.calculate_message_propagation_delay(
-            sender, receiver, Network.size(msg))
+            sender, receiver, size)
 
+        TimeSeries.note_message(msg.time)
         msg.time += delay
+
+        if Export.messages:
+            Export.note_message(msg, sender, receiver, msg.time - delay, size)
+        msg.live_epoch = receiver.state.live_epoch
         
         receiver.add_event(msg)
         sender.total_messages += 1
@@ -141,14 +248,17 @@ class Network:
         ''' 
             Initialises the Netowrk modules
                 - Gets a refenrence to the node list
-                - Calculates latency_map and locations
+                - Loads the latency / distance datasets and locations
                 - Assigns locations and bandwidth to nodes
                 - Assigns neibhours to nodes (Gossip, Sync etc...)
         '''
         Network.nodes = nodes
+        Network.matrices = None
+        Network.trees = {}
 
         Network.parse_latencies()
         Network.parse_distances()
+        Network.location_table = None
     
         Network.assign_location_to_nodes()
 
@@ -182,74 +292,64 @@ class Network:
     #             [x for x in Network.nodes if x != node],
     #             Parameters.network["num_neighbours"])
     @staticmethod
-    def assign_neighbours(node=None, num_neighbours=2, beta1=0.5):
-        num_neighbours=Parameters.network["num_neighbours"]
+    def assign_neighbours(node=None):
         '''
             (default) node -> None
-            Randomly assing neibhours to all nodes (based on the config)
-            if node is provided assign to just that node
+            Assigns neighbours to all nodes from the topology of the network type (see Topology):
+                gossip: random (num_neighbours random neighbours)
+                smallworld: random (num_neighbours + beta * number of nodes long-range random neighbours)
+                lattice: k_nearest (num_neighbours lowest delay neighbours)
+                broadcast: every other node
+            network.topology overrides the generator (random, watts_strogatz, random_regular, scale_free, k_nearest)
+
+            if node is provided (joining node - not in Network.nodes yet) assign to just that node
+            (k_nearest: lowest delay neighbours, otherwise random neighbours)
         '''
-        if node is None:
-            for n in Network.nodes:
-                Network.assign_neighbours(n)       
-        elif Parameters.network["type"]=="gossip":
-            node.neighbours = random.sample(
-                [x for x in Network.nodes if x != node],
-                num_neighbours)
-        elif Parameters.network["type"]=="broadcast":
-                node.neighbours = [x for x in Network.nodes if x != node]
-        elif Parameters.network["type"]=="smallworld":
-            # Check if there are enough nodes to sample from
-            if len(Network.nodes) > num_neighbours:
-                # Assign a small number of random neighbors
-                node.neighbours = random.sample(
-                    [x for x in Network.nodes if x != node],
-                    num_neighbours)
-            else:
-                raise ValueError("Not enough nodes to sample from")
-
-            beta1=Parameters.network["beta"]
-            # Add a few long-range connections
-            for _ in range(int(beta1 * len(Network.nodes))):
-                # Check if there are nodes to choose from
-                if Network.nodes:
-                    potential_neighbours = [n for n in Network.nodes if n != node and n not in node.neighbours]
-                    random.shuffle(potential_neighbours)
-                    for potential_neighbour in potential_neighbours:
-                        if potential_neighbour != node and potential_neighbour not in node.neighbours:
-                            node.neighbours.append(potential_neighbour)
-                            break
-                    else:
-                        raise ValueError("No suitable nodes to choose from")
-                else:
-                    raise IndexError("No nodes to choose from")
-            if len(node.neighbours) < num_neighbours:
-                raise ValueError("Not enough nodes to sample from")
+        num_neighbours = Parameters.network["num_neighbours"]
 
-            # # Add a few long-range connections
-            # for _ in range(int(beta1 * num_neighbours)):
-            #     # Check if there are nodes to choose from
-            #     if Network.nodes:
-            #         while True:
-            #             potential_neighbour = random.choice(Network.nodes)
-            #             if potential_neighbour != node and potential_neighbour not in node.neighbours:
-            #                 node.neighbours.append(potential_neighbour)
-            #                 break
-            #     else:
-            #         raise IndexError("No nodes to choose from")
-
-        elif Parameters.network["type"]=="lattice":
-                print("------------------")
-                print("lattice")
-                # Assign neighbors based on communication speed
-                speeds = [(other, Network.calculate_message_propagation_delay(node, other, 1)) 
-                        for other in Network.nodes if other != node]
-                speeds.sort(key=lambda x: x[1], reverse=False)
-                node.neighbours = [other for other, speed in speeds[:num_neighbours]]
-        else:
+        if Parameters.network["type"] not in TOPOLOGIES:
             print("parameter is ",Parameters.network["type"]) 
             raise Exception("Wrong network type")
 
+        topology = Parameters.network["topology"] or TOPOLOGIES[Parameters.network["type"]]
+        others = Network.nodes if node is None else [x for x in Network.nodes if x != node]
+        Network.adjacency = None
+
+        # smallworld: a few long-range connections on top of the random neighbours
+        degree = num_neighbours
+        if Parameters.network["type"] == "smallworld" and topology == "random":
+            degree += int(Parameters.network["beta"] * len(Network.nodes))
+
+        if topology == "complete":
+            for n in ([node] if node is not None else Network.nodes):
+                n.neighbours = [x for x in Network.nodes if x != n]
+        elif node is not None and topology == "k_nearest":
+            delays = [Network.calculate_message_propagation_delay(node, other, 1) for other in others]
+            order = np.argsort(delays, kind="stable")[:num_neighbours]
+            node.neighbours = [others[j] for j in order]
+        elif node is not None:
+            if len(others) < degree:
+                raise ValueError("Not enough nodes to sample from")
+            node.neighbours = random.sample(others, degree)
+        else:
+            N = len(Network.nodes)
+            if topology == "random":
+                csr = Topology.random_neighbours(N, degree)
+            elif topology == "watts_strogatz":
+                csr = Topology.watts_strogatz(N, num_neighbours, Parameters.network["beta"])
+            elif topology == "random_regular":
+                csr = Topology.random_regular(N, num_neighbours)
+            elif topology == "scale_free":
+                csr = Topology.scale_free(N, num_neighbours)
+            elif topology == "k_nearest":
+                csr = Topology.k_nearest(N, lambda rows: Network.delay_rows(rows, 1), num_neighbours)
+            else:
+                raise Exception(f"Wrong topology {topology}")
+
+            for i, n in enumerate(Network.nodes):
+                n.neighbours = [Network.nodes[j] for j in Topology.neighbours(csr, i)]
+            Network.adjacency = csr
+
     @staticmethod
     def calculate_message_propagation_delay(sender, receiver, message_size):
         '''
@@ -259,10 +359,95 @@ class Network:
         # transmission delay
         delay = message_size / Network.get_bandwidth(sender, receiver)
 
-        if Parameters.network["use_latency"] == "measured":
-            delay += Network.latency_map[sender.location][receiver.location][0] / 1000
-        elif Parameters.network["use_latency"] == "distance":
-            dist = Network.distance_map[sender.location][receiver.location]
+        delay += Network.propagation_delay(sender, receiver)
+
+        delay += Parameters.config.link_delay
+
+        return delay
+
+    @staticmethod
+    def delay_matrix(message_size):
+        '''
+            calculate_message_propagation_delay between every pair of Network.nodes (matrix indexed by sender, receiver)
+
+            The propagation delays and pairwise bandwidths are calculated once (recalculated if nodes are added/removed)
+        '''
+        if Network.matrices is None or len(Network.matrices[0]) != len(Network.nodes):
+            locations, bandwidths = Network.node_arrays()
+            Network.matrices = (
+                Network.location_delays()[locations[:, None], locations[None, :]],
+                np.minimum.outer(bandwidths, bandwidths),
+            )
+
+        propagation, bandwidth = Network.matrices
+        return message_size / bandwidth + propagation + (Parameters.config.link_delay)
+
+    @staticmethod
+    def delay_rows(rows, message_size):
+        '''
+            calculate_message_propagation_delay from the nodes at *rows* (indices of Network.nodes) to every node
+        '''
+        locations, bandwidths = Network.node_arrays()
+        rows = np.asarray(rows)
+
+        propagation = Network.location_delays()[locations[rows][:, None], locations[None, :]]
+        return message_size / np.minimum.outer(bandwidths[rows], bandwidths) + propagation + \
+            (Parameters.config.link_delay)
+
+    @staticmethod
+    def node_arrays():
+        '''
+            (location index, bandwidth) arrays of Network.nodes
+        '''
+        Network.location_delays()
+
+        if NodeTable.enabled:
+            ids = np.fromiter((n.id for n in Network.nodes), dtype=np.int64, count=len(Network.nodes))
+            codes = np.array([Network.location_index.get(loc, -1) for loc in NodeTable.locations] + [-1], dtype=np.int64)
+            return codes[NodeTable.location[ids]], NodeTable.bandwidth[ids].astype(float)
+
+        return (
+            np.array([Network.location_index[n.location] for n in Network.nodes], dtype=np.int64),
+            np.array([n.bandwidth for n in Network.nodes], dtype=float),
+        )
+
+    @staticmethod
+    def location_delays():
+        '''
+            propagation delay between every pair of Network.locations (indexed by Network.location_index)
+            - calculated once per loaded dataset
+        '''
+        if Network.location_table is None:
+            N = len(Network.locations)
+            Network.location_index = {loc: i for i, loc in enumerate(Network.locations)}
+
+            # same calculation as propagation_delay on the dataset matrices
+            if Parameters.network["use_latency"] == "measured":
+                rows = [Network.latencies.index[loc] for loc in Network.locations]
+                Network.location_table = Network.latencies.mean_ms[np.ix_(rows, rows)].astype(float) / 1000
+                np.fill_diagonal(Network.location_table, Parameters.network["same_city_latency_ms"] / 1000)
+            elif Parameters.network["use_latency"] == "distance":
+                rows = [Network.distances.index[loc] for loc in Network.locations]
+                dist = Network.distances.km[np.ix_(rows, rows)].astype(float) * 0.621371
+                Network.location_table = ((0.022 * dist + 4.862) / 2) / 1000
+            else:
+                Network.location_table = np.zeros((N, N))
+
+        return Network.location_table
+
+    @staticmethod
+    def propagation_delay(sender, receiver):
+        '''
+            Propagation latency (s) between the locations of sender and receiver
+        '''
+        if Parameters.config.use_latency == "measured":
+            if sender.location == receiver.location:
+                return Parameters.config.same_city_latency_ms / 1000
+            index = Network.latencies.index
+            return float(Network.latencies.mean_ms[index[sender.location], index[receiver.location]]) / 1000
+        elif Parameters.config.use_latency == "distance":
+            index = Network.distances.index
+            dist = float(Network.distances.km[index[sender.location], index[receiver.location]])
             dist = dist * 0.621371 # conversion to miles since formula is based on miles
             '''
                 y = 0.022x + 4.862 is fitted to match the round trip latency between 2
@@ -272,12 +457,34 @@ class Network:
                 / 2 to get the single trip latency
                 / 1000 to get seconds (formula fitted on ms)
             '''
-            delay += ((0.022 * dist + 4.862) / 2) / 1000
-        
+            return ((0.022 * dist + 4.862) / 2) / 1000
 
-        delay += Parameters.network["queueing_delay"] + Parameters.network["processing_delay"]
+        return 0
 
-        return delay
+    @staticmethod
+    def calculate_sync_delays(sender, receiver, sizes):
+        '''
+            Pipelined transfer model for syncing blocks of the given *sizes* (array) from sender to receiver
+                - blocks are requested in windows of Parameters.config.sync_window blocks and each
+                  window pays the request + propagation + queueing + processing delays once
+                - block data is streamed back to back limited by the bandwidth of the link
+                - blocks are validated in order as soon as they arrive (block_val_delay each)
+
+            Returns an array with the time (relative to the request) each block is received and validated
+        '''
+        sizes = np.asarray(sizes, dtype=float)
+        idx = np.arange(len(sizes))
+
+        window_overhead = Parameters.config.sync_message_request_delay + Network.propagation_delay(sender, receiver) + \
+            Parameters.config.link_delay
+
+        # windows are requested one after the other: window w arrives after w+1 request overheads
+        arrival = (idx // Parameters.config.sync_window + 1) * window_overhead + \
+            np.cumsum(sizes) / Network.get_bandwidth(sender, receiver)
+
+        # validated[i] = max(arrival[i], validated[i-1]) + block_val_delay (unrolled into a running maximum)
+        val = Parameters.config.block_val_delay
+        return val * (idx + 1) + np.maximum.accumulate(arrival - val * idx) if len(sizes) else arrival
 
     @staticmethod
     def assign_location_to_nodes(node=None, location=None):
@@ -289,7 +496,7 @@ class Network:
         if node is None:
             for n in Network.nodes:
                 n.location = random.choice(Network.locations)
-                tools.debug_logs(msg=f"{n}: {n.location}")
+                tools.debug_logs(msg=lambda: f"{n}: {n.location}")
 
         else:
             if location is None:
@@ -304,30 +511,16 @@ class Network:
     @staticmethod
     def parse_latencies():
         '''
-            Initialised the Network.locations list the Network.latency map from the JSON dataset
+            Loads the measured latency dataset (NetworkLatencies - see Datasets) and its locations
+            (the latency between nodes in the same city is network.same_city_latency_ms - see propagation_delay)
         '''
-        Network.locations = []
-        Network.latency_map = {}
-
-        with open("NetworkLatencies/latency_map.json","rb") as f:
-            Network.latency_map = json.load(f)
-        
-        Network.locations = list(Network.latency_map.keys())
+        Network.latencies = Datasets.load("latency")
+        Network.locations = Network.latencies.locations
 
-        for loc in Network.locations:
-            Network.latency_map[loc][loc] = (
-                Parameters.network["same_city_latency_ms"],
-                Parameters.network["same_city_dev_ms"]
-            )
-    
     def parse_distances():
-        Network.locations = []
-        Network.distance_map = {}
-    
-        with open("NetworkLatencies/point_distances_km.json","rb") as f:
-            Network.distance_map = json.load(f)
-        
+        Network.distances = Datasets.load("distance")
+
         # overwritting the locations is fine to gurantee that they exists 
         # (this is the case if we laoded latencied before and prevents an error if we dont want to use latencies)
-        Network.locations = list(Network.distance_map.keys())
+        Network.locations = Network.distances.locations
 
@@ -1,12 +1,24 @@
 from Chain.EventQueue import Queue
+from Chain.TimerWheel import TimerWheel
 from Chain.Scheduler import Scheduler
+from Chain.Ledger import Ledger
+from Chain.Block import BlockStore
+from Chain.FlightRecorder import FlightRecorder
+from Chain.SteadyState import SteadyState
+from Chain.TimeSeries import TimeSeries
+from Chain.TxLatency import TxLatency
+from Chain.Export import Export
+from Chain.Network import Network
 
 from Chain.Parameters import Parameters
+from Chain.NodeTable import NodeTable, StateView
 
 import Chain.Handler as Handler
 
 from types import SimpleNamespace
 
+import numpy as np
+
 from Chain.tools import color
 
 class Node():
@@ -15,7 +27,8 @@ class Node():
 
     Attributes:
         id: unique node id
-        blockchain: list of blocks
+        blockchain: Ledger storing the local chain (shared, immutable Block objects - see BlockStore)
+            and the time each block was added to this node's chain
         pool: list of new transactions not yet added to blocks
         bloks: No. of blocks
         state: A namespace denoting the sate of the node
@@ -23,10 +36,17 @@ class Node():
             alive...
             cp: a reference to the CP class
             cp_state: a namepsace storring CP specific data (defined by the CP)
+            sync: progress of a range sync (defined by HighLevelSync) - None when not syncing
+            cp_epoch: incremented when the node changes CP - local events scheduled under an older epoch are stale
+            live_epoch: incremented when the node crashes - messages in flight to the node when it crashed are stale
+                (stale events are discarded lazily when they reach the front of the queue)
             extra_data: a map sotring extra data needed in the node
 
         Queue: The event queue sotring events (used in the simulation)
 
+        Timers: TimerWheel holding the CP timers (timeouts) - armed/cancelled in O(1) and
+            merged with the queue (and sync_queue) by time when picking the next event
+
         Backlog: Stores 'future' events
             When current event cannot be executed (due to message delays
             causing lag in state updates) it is added to the backlog. Once
@@ -44,7 +64,7 @@ class Node():
 
     def __init__(self, id):
         self.id = id
-        self.blockchain = []
+        self.blockchain = Ledger()
         self.pool = []
         self.blocks = 0
         self.total_messages=0
@@ -57,9 +77,25 @@ class Node():
             alive=True,
             cp=None,
             cp_state = None,
+            sync = None,
+            cp_epoch = 0,
+            live_epoch = 0,
         )
 
-        self.behaviour = SimpleNamespace(
+        self.behaviour = Node.new_behaviour()
+
+        self.scheduler = Scheduler(self)
+
+        self.queue = Queue()
+        self.sync_queue = Queue()
+        self.timers = TimerWheel()
+
+        self.backlog = []
+        self.validator=False
+    
+    @staticmethod
+    def new_behaviour():
+        return SimpleNamespace(
             # model behaiviour of a fautly node
             faulty=None,
             mean_fault_time=None,
@@ -72,14 +108,13 @@ class Node():
             sync_fault_chance=None,
         )
 
-        self.scheduler = Scheduler(self)
-
-        self.queue = Queue()
-        self.sync_queue = Queue()
+    @staticmethod
+    def create(id):
+        '''
+            new node with the given id (a TableNode if the node table is enabled - see NodeTable)
+        '''
+        return TableNode(id) if NodeTable.enabled else Node(id)
 
-        self.backlog = []
-        self.validator=False
-    
     def __repr__(self):
         if self.state.alive:
             return f"Node: {self.id}"
@@ -103,9 +138,9 @@ class Node():
     @property
     def ids(self):
         '''
-            returns a list of all block ids in the nodes local blockchain
+            returns all block ids in the nodes local blockchain (array - do not modify)
         '''
-        return [x.id for x in self.blockchain]
+        return self.blockchain.ids
 
     @property
     def trunc_ids(self):
@@ -117,20 +152,15 @@ class Node():
 
     @property
     def last_block(self):
-        return self.blockchain[-1]
+        return self.blockchain.last
 
     @property
     def next_event(self):
         '''
             returns next event (without removing for queue)
         '''
-        sync_time = self.sync_queue.time_next
-        main_time = self.queue.time_next
-
-        if sync_time is None or main_time < sync_time:
-            return self.queue.get_next_event()
-        else:
-            return self.sync_queue.get_next_event()
+        queue = self.next_queue()
+        return queue.get_next_event() if queue is not None else None
     
     @property
     def behaviour_state_to_string(self):
@@ -150,7 +180,7 @@ class Node():
     def to_serializable(self):
         return {
             "id": self.id,
-            "blockchain": [x.to_serializable() for x in self.blockchain[1:]], # ignore genesis block
+            "blockchain": [b.to_serializable(t) for b, t in zip(self.blockchain.blocks[1:], self.blockchain.times_added[1:])], # ignore genesis block
             "pool": self.pool,
             "blocks": self.blocks,
 
@@ -198,32 +228,86 @@ class Node():
         '''
             Comparing the latest block of current node with all neighbours to check sync status
         '''
-        latest_neighbour_block = max(
-            [{"block":n.last_block, "neighbour": n} for n in self.neighbours],
-            key=lambda x:x["block"].depth)
+        latest_neighbour = max(self.neighbours, key=lambda n: n.blockchain.height)
 
-        if latest_neighbour_block["block"].depth > self.last_block.depth:
-            return False, latest_neighbour_block["neighbour"]
+        if latest_neighbour.blockchain.height > self.blockchain.height:
+            return False, latest_neighbour
         else:
             return True, None
 
+    def is_stale(self, event):
+        '''
+            True if the event is a message sent before the node crashed or a local event scheduled before the node changed CP
+        '''
+        return (event.live_epoch is not None and event.live_epoch != self.state.live_epoch) or \
+            (event.cp_epoch is not None and event.cp_epoch != self.state.cp_epoch)
+
+    def discard_stale_events(self):
+        '''
+            pops stale events from the front of the main queue and the timers
+        '''
+        while self.queue.event_list and self.is_stale(self.queue.event_list[0]):
+            self.queue.pop_next_event()
+
+        while self.timers.count and self.is_stale(self.timers.get_next_event()):
+            self.timers.pop_next_event()
+
+    def next_queue(self):
+        '''
+            returns the queue (main queue, timers or sync queue) holding the next event - None if all are empty
+        '''
+        self.discard_stale_events()
+
+        next_queue, next_time = None, None
+        for queue in (self.queue, self.timers, self.sync_queue):
+            time = queue.time_next
+            if time is not None and (next_time is None or time < next_time):
+                next_queue, next_time = queue, time
+
+        return next_queue
+
     def kill(self):
         self.state.alive = False
+        # invalidates the messages in flight to the node
+        self.state.live_epoch += 1
+        Network.topology_changed()
 
     def resurect(self):
         self.state.alive = True
+        Network.topology_changed()
 
     def add_block(self, block, time):
         '''
             Adds 'block' to blockchain at time 'time'
         '''
-        block.time_added = time
-        self.blockchain.append(block)
+        self.blockchain.append(block, time)
+        FlightRecorder.note_block(time)
+        TxLatency.note_add(block, time)
+        if BlockStore.first_commit(block):
+            Node.note_first_commit(block, time)
 
         # update transaction pool removed verified transactions
         ids = [x.id for x in block.transactions]
         self.pool = [x for x in self.pool if x.id not in ids]
 
+    def add_synced_block(self, block, time_added, time):
+        '''
+            Adds 'block' received through a sync at time 'time' ('time_added': time the sending node added it)
+        '''
+        self.blockchain.append(block, time_added)
+        TxLatency.note_add(block, time)
+
+    @staticmethod
+    def note_first_commit(block, time):
+        '''
+            called once per block - the first time it's added to the chain of any node (BlockStore.first_commit)
+        '''
+        SteadyState.note_block(block, time)
+        TimeSeries.note_block(block, time)
+        TxLatency.note_block(block, time)
+        if Export.enabled:
+            Export.note_block(block, time)
+
     def add_event(self, event):
         ''' adds event to the queue of the node if the node is online'''
 
@@ -239,15 +323,116 @@ class Node():
         ''' 
             handles the next event of the current node
         '''
-        sync_time = self.sync_queue.time_next
-        main_time = self.queue.time_next
-
-        if sync_time is None or main_time < sync_time:
-            event = self.queue.pop_next_event()
-        else:
-            event = self.sync_queue.pop_next_event()
+        event = self.next_queue().pop_next_event()
 
         Handler.handle_event(event)
 
+    def add_sync_event(self, event):
+        self.sync_queue.add_event(event)
+
     def remove_event(self, event):
         self.queue.remove_event(event)
+
+    def arm_timer(self, event):
+        ''' arms timer event if the node is online (see add_event)'''
+        if self.state.alive:
+            self.timers.arm(event)
+
+    def cancel_timer(self, event):
+        self.timers.cancel(event)
+
+class TableNode(Node):
+    '''
+        Node whose alive, synced, validator, location, bandwidth, height and CP state fields are stored in the
+        NodeTable columns
+
+        Only the fields that differ between nodes are stored per node (chain, pool, backlog, neighbours, cp_state):
+            queue, sync_queue, timers: shared empty instances until the first event is added to them
+            behaviour: created on first use (most nodes are never faulty / byzantine)
+            scheduler: shared (schedules for the creator it is given)
+    '''
+    queue = sync_queue = Queue()
+    timers = TimerWheel(resolution=1)
+    scheduler = Scheduler(None)
+    _behaviour = None
+
+    def __init__(self, id):
+        self.id = id
+        NodeTable.add(self)
+
+        self.blockchain = Ledger()
+        self.pool = []
+        self.blocks = 0
+        self.total_messages = 0
+        self.neighbours = None
+
+        self.state = StateView(id)
+        self.backlog = []
+
+    @property
+    def behaviour(self):
+        if self._behaviour is None:
+            self._behaviour = Node.new_behaviour()
+        return self._behaviour
+
+    validator = property(
+        lambda self: bool(NodeTable.validator[self.id]),
+        lambda self, value: NodeTable.validator.__setitem__(self.id, value))
+
+    @property
+    def location(self):
+        code = NodeTable.location[self.id]
+        return NodeTable.locations[code] if code >= 0 else None
+
+    @location.setter
+    def location(self, value):
+        NodeTable.location[self.id] = -1 if value is None else NodeTable.intern(NodeTable.locations, value)
+
+    @property
+    def bandwidth(self):
+        value = NodeTable.bandwidth[self.id]
+        return None if value != value else float(value)
+
+    @bandwidth.setter
+    def bandwidth(self, value):
+        NodeTable.bandwidth[self.id] = np.nan if value is None else value
+
+    def add_block(self, block, time):
+        super().add_block(block, time)
+        NodeTable.height[self.id] = self.blockchain.height
+
+    def add_synced_block(self, block, time_added, time):
+        super().add_synced_block(block, time_added, time)
+        NodeTable.height[self.id] = self.blockchain.height
+
+    # the queues changed - the next event time is recalculated (see NodeTable.next_node)
+    # (the node gets its own queue / timers when the first event is added to them)
+    def add_event(self, event):
+        if self.queue is TableNode.queue and self.state.alive:
+            self.queue = Queue()
+        super().add_event(event)
+        NodeTable.dirty[self.id] = True
+
+    def add_sync_event(self, event):
+        if self.sync_queue is TableNode.sync_queue:
+            self.sync_queue = Queue()
+        super().add_sync_event(event)
+        NodeTable.dirty[self.id] = True
+
+    def remove_event(self, event):
+        super().remove_event(event)
+        NodeTable.dirty[self.id] = True
+
+    def arm_timer(self, event):
+        if self.timers is TableNode.timers and self.state.alive:
+            self.timers = TimerWheel()
+        super().arm_timer(event)
+        NodeTable.dirty[self.id] = True
+
+    def cancel_timer(self, event):
+        super().cancel_timer(event)
+        NodeTable.dirty[self.id] = True
+
+    def handle_next_event(self):
+        NodeTable.dirty[self.id] = True
+        super().handle_next_event()
@@ -0,0 +1,256 @@
+'''
+    Struct-of-arrays node table (Parameters.execution["node_table"]) for simulations with many nodes
+
+    With the table enabled the per node fields used by scans over all the nodes are stored in NumPy columns
+    indexed by node id instead of in per node objects:
+        alive, synced, validator, member (part of the simulation - removed nodes are not)
+        location (index in NodeTable.locations), bandwidth, height (chain height)
+        cp (index in NodeTable.cps), state (CP state - index in NodeTable.states), round (CP round)
+        cp_epoch, live_epoch (see Node.is_stale)
+        next_time: time of the next event of the node (recalculated lazily for the dirty nodes - see next_node)
+
+    Nodes (Node.TableNode), their state (StateView), CP state (CPStateView) and round change state (RoundView)
+    are thin views whose attributes read and write the columns, so the CP code is the same in both modes.
+    Scans like "all alive nodes" are vectorised (alive_ids, FastPath.eligible) and picking the node with the
+    next event (Simulation.get_next_event) is an argmin over next_time instead of a pass over every node.
+
+    Table nodes only allocate what differs between nodes: the empty queues / timers, the scheduler and the
+    default behaviour are shared until a node needs its own (see TableNode) - a new table node takes ~40% of the
+    memory of a Node. The rest of a node's memory is its model state (chain, transaction pool, armed CP timers,
+    CP state), the same in both modes.
+
+    The columns grow (doubling) as nodes are added.
+'''
+from types import SimpleNamespace
+
+import numpy as np
+
+from Chain.Parameters import Parameters
+
+# column -> (dtype, value of a new row)
+COLUMNS = {
+    "alive": (bool, True),
+    "synced": (bool, True),
+    "validator": (bool, False),
+    "member": (bool, True),
+    "location": (np.int32, -1),
+    "bandwidth": (np.float64, np.nan),
+    "height": (np.int64, -1),
+    "cp": (np.int8, -1),
+    "state": (np.int8, 0),
+    "round": (np.int64, 0),
+    "cp_epoch": (np.int64, 0),
+    "live_epoch": (np.int64, 0),
+    "dirty": (bool, True),
+    "next_time": (np.float64, np.inf),
+}
+
+class NodeTable:
+    enabled = False
+
+    # number of rows in use (highest node id + 1) and node of each row
+    size = 0
+    nodes = []
+
+    # interned values of the location, cp and state columns
+    locations = []
+    cps = []
+    states = [""]
+
+    alive = synced = validator = member = location = bandwidth = height = cp = state = round = None
+    cp_epoch = live_epoch = dirty = next_time = None
+
+    @staticmethod
+    def init(capacity):
+        NodeTable.enabled = bool(Parameters.execution.get("node_table", False))
+        NodeTable.size = 0
+        NodeTable.nodes = []
+        NodeTable.locations = []
+        NodeTable.cps = []
+        NodeTable.states = [""]
+
+        for name, (dtype, _) in COLUMNS.items():
+            setattr(NodeTable, name, np.empty(max(capacity, 1), dtype=dtype))
+
+    @staticmethod
+    def add(node):
+        '''
+            adds the row of *node* (default values)
+        '''
+        id = node.id
+        capacity = len(NodeTable.alive)
+        if id >= capacity:
+            capacity = max(2 * capacity, id + 1)
+            for name in COLUMNS:
+                column = getattr(NodeTable, name)
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:len(column)] = column
+                setattr(NodeTable, name, grown)
+
+        for name, (_, value) in COLUMNS.items():
+            getattr(NodeTable, name)[id] = value
+
+        NodeTable.nodes.extend([None] * (id + 1 - len(NodeTable.nodes)))
+        NodeTable.nodes[id] = node
+        NodeTable.size = max(NodeTable.size, id + 1)
+
+    @staticmethod
+    def remove(node):
+        NodeTable.member[node.id] = False
+
+        # rows past the last node taking part in the simulation are not scanned
+        NodeTable.size = int(NodeTable.member_ids()[-1]) + 1 if NodeTable.member[:NodeTable.size].any() else 0
+
+    @staticmethod
+    def intern(values, value):
+        try:
+            return values.index(value)
+        except ValueError:
+            values.append(value)
+            return len(values) - 1
+
+    @staticmethod
+    def member_ids():
+        '''
+            ids of the nodes taking part in the simulation (ascending)
+        '''
+        return np.flatnonzero(NodeTable.member[:NodeTable.size])
+
+    @staticmethod
+    def alive_ids():
+        '''
+            ids of the alive nodes taking part in the simulation
+        '''
+        n = NodeTable.size
+        return np.flatnonzero(NodeTable.alive[:n] & NodeTable.member[:n])
+
+    @staticmethod
+    def next_node():
+        '''
+            (node, event) of the alive node with the earliest next event (ties: lowest id)
+
+            next_time is only recalculated for the nodes whose queues / epochs changed since it was calculated (dirty)
+        '''
+        n = NodeTable.size
+        candidates = NodeTable.alive[:n] & NodeTable.member[:n]
+
+        for i in np.flatnonzero(NodeTable.dirty[:n] & candidates):
+            event = NodeTable.nodes[i].next_event
+            NodeTable.next_time[i] = np.inf if event is None else event.time
+            NodeTable.dirty[i] = False
+
+        times = np.where(candidates, NodeTable.next_time[:n], np.inf)
+        i = int(np.argmin(times))
+        if times[i] == np.inf:
+            raise ValueError("no node has a next event")
+
+        node = NodeTable.nodes[i]
+        return node, node.next_event
+
+    @staticmethod
+    def cp_state(node, **fields):
+        '''
+            CP state of *node* with the given fields (CPStateView of table nodes)
+        '''
+        if NodeTable.enabled and NodeTable.nodes[node.id] is node:
+            return CPStateView(node.id, **fields)
+        return SimpleNamespace(**fields)
+
+    @staticmethod
+    def round_state(node, **fields):
+        '''
+            round change state of *node* with the given fields (RoundView of table nodes - see Rounds.round_change_state)
+        '''
+        if NodeTable.enabled and node is not None and NodeTable.nodes[node.id] is node:
+            return RoundView(node.id, **fields)
+        return SimpleNamespace(**fields)
+
+def flag(name):
+    '''
+        property reading / writing the boolean column *name* at the row of the view
+    '''
+    def get(self):
+        return bool(getattr(NodeTable, name)[self.id])
+
+    def set(self, value):
+        getattr(NodeTable, name)[self.id] = value
+
+    return property(get, set)
+
+def epoch(name):
+    '''
+        property reading / writing the epoch column *name* - a new epoch makes events stale so the next event
+        time of the node is recalculated
+    '''
+    def get(self):
+        return int(getattr(NodeTable, name)[self.id])
+
+    def set(self, value):
+        getattr(NodeTable, name)[self.id] = value
+        NodeTable.dirty[self.id] = True
+
+    return property(get, set)
+
+class StateView:
+    '''
+        node.state of a table node (alive, synced, cp and the epochs are stored in the table)
+    '''
+    __slots__ = ("id", "cp_state", "sync", "fast_path")
+
+    alive = flag("alive")
+    synced = flag("synced")
+    cp_epoch = epoch("cp_epoch")
+    live_epoch = epoch("live_epoch")
+
+    def __init__(self, id):
+        self.id = id
+        self.cp_state = None
+        self.sync = None
+
+    @property
+    def cp(self):
+        code = NodeTable.cp[self.id]
+        return NodeTable.cps[code] if code >= 0 else None
+
+    @cp.setter
+    def cp(self, value):
+        NodeTable.cp[self.id] = -1 if value is None else NodeTable.intern(NodeTable.cps, value)
+
+    def __repr__(self):
+        return f"StateView(id={self.id}, alive={self.alive}, synced={self.synced}, cp={self.cp}, cp_state={self.cp_state})"
+
+class CPStateView(SimpleNamespace):
+    '''
+        cp_state of a table node (state is stored in the table, the other CP fields in the namespace)
+    '''
+    def __init__(self, id, **fields):
+        super().__init__()
+        object.__setattr__(self, "_id", id)
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @property
+    def state(self):
+        return NodeTable.states[NodeTable.state[self._id]]
+
+    @state.setter
+    def state(self, value):
+        NodeTable.state[self._id] = NodeTable.intern(NodeTable.states, value)
+
+class RoundView(SimpleNamespace):
+    '''
+        round change state of a table node (round is stored in the table)
+    '''
+    def __init__(self, id, **fields):
+        super().__init__()
+        object.__setattr__(self, "_id", id)
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @property
+    def round(self):
+        return int(NodeTable.round[self._id])
+
+    @round.setter
+    def round(self, value):
+        NodeTable.round[self._id] = value
@@ -0,0 +1,64 @@
+'''
+    Event types (payload["type"]) interned as small integer opcodes
+
+    Every Event / SystemEvent gets its opcode (event.op) when it is created, so handlers dispatch with a list
+    index (Dispatch) instead of a chain of string comparisons, and the number of handled events of each type
+    is a counter in an array (counts - see Handler.handle_event).
+
+    Opcodes are assigned on first use (types are not declared up front) and are stable for the process.
+
+    Example:
+        dispatch = Dispatch({'prepare': prepare, 'commit': commit}, default=lambda event: 'unhadled')
+        dispatch(event)     # prepare(event) if event.payload['type'] == 'prepare'
+'''
+from array import array
+
+# opcode -> type, type -> opcode
+NAMES = []
+CODES = {}
+
+# number of handled events of each opcode
+counts = array('q')
+
+def intern(type):
+    '''
+        opcode of *type* (assigned if it's new)
+    '''
+    op = CODES.get(type)
+    if op is None:
+        op = CODES[type] = len(NAMES)
+        NAMES.append(type)
+        counts.append(0)
+
+    return op
+
+def reset_counts():
+    for op in range(len(counts)):
+        counts[op] = 0
+
+def event_counts():
+    '''
+        {type: number of handled events} of the types handled at least once
+    '''
+    return {NAMES[op]: count for op, count in enumerate(counts) if count}
+
+class Dispatch:
+    '''
+        Dispatch table: handlers (type -> handler) indexed by opcode - calling it calls the handler of the event's
+        type (default for any other type)
+    '''
+    __slots__ = ("handlers", "default")
+
+    def __init__(self, handlers, default):
+        self.default = default
+        self.handlers = []
+
+        for type, handler in handlers.items():
+            op = intern(type)
+            self.handlers.extend([default] * (op + 1 - len(self.handlers)))
+            self.handlers[op] = handler
+
+    def __call__(self, event):
+        handlers = self.handlers
+        op = event.op
+        return (handlers[op] if op < len(handlers) else self.default)(event)
@@ -1,10 +1,190 @@
 import yaml, os
 
+import Chain.Opcodes as Opcodes
+
+# C (libyaml) loader when available
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 def read_yaml(path):
     with open(path, 'rb') as f:
-        data = yaml.safe_load(f)
+        data = yaml.load(f, Loader=Loader)
     return data
 
+# Parameters.config attribute -> (Parameters section, key)
+CONFIG = {
+    "Nn": ("application", "Nn"),
+    "f": ("application", "f"),
+    "required_messages": ("application", "required_messages"),
+    "Tsize": ("application", "Tsize"),
+
+    "simTime": ("simulation", "simTime"),
+
+    "creation_time": ("execution", "creation_time"),
+    "block_val_delay": ("execution", "block_val_delay"),
+    "msg_val_delay": ("execution", "msg_val_delay"),
+    "sync_message_request_delay": ("execution", "sync_message_request_delay"),
+    "sync_window": ("execution", "sync_window"),
+    "engine": ("execution", "engine"),
+
+    "Bsize": ("data", "Bsize"),
+    "block_interval": ("data", "block_interval"),
+
+    "network_type": ("network", "type"),
+    "gossip": ("network", "gossip"),
+    "base_msg_size": ("network", "base_msg_size"),
+    "queueing_delay": ("network", "queueing_delay"),
+    "processing_delay": ("network", "processing_delay"),
+    "use_latency": ("network", "use_latency"),
+    "same_city_latency_ms": ("network", "same_city_latency_ms"),
+
+    "PBFT_timeout": ("PBFT", "timeout"),
+    "BigFoot_timeout": ("BigFoot", "timeout"),
+    "fast_path_timeout": ("BigFoot", "fast_path_timeout"),
+}
+
+# values calculated from the CONFIG attributes
+DERIVED = ("link_delay", "relay")
+
+# config file validation: path of the key (sections / keys) -> allowed values (a tuple of strings) or required type
+# (every key read by Parameters.compile and the module inits - see Simulation.__init__)
+NUMBER = (int, float)
+SCHEMA = {
+    ("simulation", "init_CP"): ("PBFT", "BigFoot"),
+    ("simulation", "simTime"): NUMBER,
+    ("simulation", "interval_switch"): bool,
+    ("simulation", "interval_mean"): NUMBER,
+    ("simulation", "flight_recorder", "size"): int,
+    ("simulation", "flight_recorder", "stall"): NUMBER,
+    ("simulation", "flight_recorder", "path"): str,
+    ("simulation", "telemetry", "enabled"): bool,
+    ("simulation", "telemetry", "interval"): NUMBER,
+    ("simulation", "telemetry", "check_every"): int,
+    ("simulation", "telemetry", "path"): str,
+    ("simulation", "telemetry", "max_bytes"): int,
+    ("simulation", "telemetry", "backups"): int,
+    ("simulation", "telemetry", "http_port"): int,
+    ("simulation", "export", "enabled"): bool,
+    ("simulation", "export", "dir"): str,
+    ("simulation", "export", "run"): str,
+    ("simulation", "export", "chunk_rows"): int,
+    ("simulation", "export", "messages"): bool,
+    ("simulation", "time_series", "bucket"): NUMBER,
+    ("simulation", "tx_latency", "mode"): ("first", "quorum"),
+    ("simulation", "steady_state", "enabled"): bool,
+    ("simulation", "steady_state", "batches"): int,
+    ("simulation", "steady_state", "ci_target"): NUMBER,
+    ("simulation", "steady_state", "min_blocks"): int,
+    ("simulation", "steady_state", "check_every"): int,
+    ("simulation", "steady_state", "stall"): NUMBER,
+    ("application", "Nn"): int,
+    ("application", "TI_dur"): NUMBER,
+    ("application", "Tn"): int,
+    ("application", "Tsize"): NUMBER,
+    ("execution", "creation_time"): NUMBER,
+    ("execution", "block_val_delay"): NUMBER,
+    ("execution", "msg_val_delay"): NUMBER,
+    ("execution", "sync_message_request_delay"): NUMBER,
+    ("execution", "sync_mode"): ("fast", "range"),
+    ("execution", "sync_window"): int,
+    ("execution", "sync_parallel_requests"): int,
+    ("execution", "timer_resolution"): NUMBER,
+    ("execution", "engine"): ("message", "hybrid"),
+    ("execution", "node_table"): bool,
+    ("execution", "alpha"): NUMBER,
+    ("data", "Bsize"): NUMBER,
+    ("data", "block_interval"): NUMBER,
+    ("network", "type"): ("gossip", "broadcast", "smallworld", "lattice"),
+    ("network", "gossip"): ("relay", "analytic"),
+    ("network", "gossip_size_class"): NUMBER,
+    ("network", "base_msg_size"): NUMBER,
+    ("network", "num_neighbours"): int,
+    ("network", "topology"): str,
+    ("network", "use_latency"): str,
+    ("network", "same_city_latency_ms"): NUMBER,
+    ("network", "same_city_dev_ms"): NUMBER,
+    ("network", "queueing_delay"): NUMBER,
+    ("network", "processing_delay"): NUMBER,
+    ("network", "beta"): NUMBER,
+    ("network", "bandwidth", "mean"): NUMBER,
+    ("network", "bandwidth", "dev"): NUMBER,
+    ("network", "bandwidth", "debug"): bool,
+    ("consensus", "BigFoot"): str,
+    ("consensus", "PBFT"): str,
+    ("behaviour", "behaviour_interval"): NUMBER,
+    ("behaviour", "byzantine_nodes", "num_byzantine"): int,
+    ("behaviour", "sync", "bad_data", "delay"): NUMBER,
+    ("behaviour", "sync", "no_response", "delay"): NUMBER,
+    ("behaviour", "sync", "probs", "low"): int,
+    ("behaviour", "sync", "probs", "high"): int,
+    ("behaviour", "crash_probs", "faulty_nodes"): int,
+    ("behaviour", "crash_probs", "mean_fault_time", "low"): int,
+    ("behaviour", "crash_probs", "mean_fault_time", "high"): int,
+    ("behaviour", "crash_probs", "mean_recovery_time", "low"): int,
+    ("behaviour", "crash_probs", "mean_recovery_time", "high"): int,
+}
+
+# the same for the CP config files (consensus.<CP>)
+CP_SCHEMA = {
+    "PBFT": {("timeout",): NUMBER},
+    "BigFoot": {("timeout",): NUMBER, ("fast_path_timeout",): NUMBER},
+}
+
+MISSING = object()
+
+def validate(params, path, schema=SCHEMA):
+    '''
+        Checks the config *params* (loaded from *path*) against *schema* - raises a ValueError listing every problem
+    '''
+    errors = []
+    for keys, expected in schema.items():
+        name = ".".join(keys)
+
+        value = params
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                value = MISSING
+                break
+            value = value[key]
+
+        if value is MISSING:
+            errors.append(f"{name} is missing")
+            continue
+
+        if isinstance(expected, tuple) and all(isinstance(x, str) for x in expected):
+            if value not in expected:
+                errors.append(f"{name} is {value!r} (expected one of {', '.join(expected)})")
+        elif expected is bool:
+            if not isinstance(value, bool):
+                errors.append(f"{name} is {value!r} (expected bool)")
+        elif isinstance(value, bool) or not isinstance(value, expected):
+            type_name = expected.__name__ if isinstance(expected, type) else "a number"
+            errors.append(f"{name} is {value!r} (expected {type_name})")
+
+    if not errors and schema is SCHEMA and not 0 < params["execution"]["alpha"] <= 1:
+        errors.append(f"execution.alpha is {params['execution']['alpha']!r} (expected 0 < alpha <= 1)")
+
+    if errors:
+        raise ValueError(f"invalid config {path}:\n    " + "\n    ".join(errors))
+
+class Config:
+    '''
+        Frozen snapshot of the parameters read on hot paths (Parameters.config - see CONFIG for the attributes)
+
+        Rebuilt by Parameters.compile whenever the parameters change through Manager.modify / calculate_fault_tolerance
+        (code changing the Parameters dicts directly must call Parameters.compile)
+    '''
+    __slots__ = tuple(CONFIG) + DERIVED
+
+    def __init__(self, values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Parameters.config is read only (set {name} with Manager.modify)")
+
+    def __repr__(self):
+        return f"Config({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
 class Parameters:
     '''
         Contains all the parameters defining the simulator
@@ -19,6 +199,23 @@ class Parameters:
     BigFoot = {}
     PBFT = {}
 
+    # frozen snapshot of the hot path parameters (see Config)
+    config = None
+
+    @staticmethod
+    def compile():
+        '''
+            Rebuilds Parameters.config from the parameter dicts
+        '''
+        values = {name: getattr(Parameters, section)[key] for name, (section, key) in CONFIG.items()}
+
+        for name in ("PBFT_timeout", "BigFoot_timeout", "fast_path_timeout"):
+            values[name] = float(values[name])
+        values["link_delay"] = values["queueing_delay"] + values["processing_delay"]
+        values["relay"] = values["network_type"] == "gossip" and values["gossip"] == "relay"
+
+        Parameters.config = Config(values)
+
     @staticmethod
     def export_state():
         return {
@@ -45,12 +242,17 @@ class Parameters:
         Parameters.BigFoot = state["BigFoot"]
         Parameters.PBFT = state["PBFT"]
 
+        Parameters.compile()
+
     @staticmethod
     def load_params_from_config():
-        params = read_yaml(f"Configs/{os.environ['config']}.yaml")
+        path = f"Configs/{os.environ['config']}.yaml"
+        params = read_yaml(path)
+        validate(params, path)
 
         Parameters.simulation = params["simulation"]
-        Parameters.simulation["events"] = {} # cnt events of each type
+        Parameters.simulation["events"] = {} # cnt events of each type (filled from Opcodes.counts at the end of the run)
+        Opcodes.reset_counts()
         
         Parameters.behaiviour = params["behaviour"]
 
@@ -59,12 +261,15 @@ class Parameters:
         Parameters.application = params["application"]
         Parameters.application["txIDS"] = 0 # incremental txion ids starting on...
         Parameters.execution = params["execution"]
-        Parameters.calculate_fault_tolerance()
 
         Parameters.data = params["data"]
 
         Parameters.BigFoot = read_yaml(params['consensus']['BigFoot'])
         Parameters.PBFT = read_yaml(params['consensus']['PBFT'])
+        for cp in CP_SCHEMA:
+            validate(getattr(Parameters, cp), params['consensus'][cp], CP_SCHEMA[cp])
+
+        Parameters.calculate_fault_tolerance()
 
 
     @staticmethod
@@ -77,4 +282,6 @@ class Parameters:
         else:
             Parameters.application["f"] = int((Parameters.application["Nn"]*alpha - 1) / 3)
             Parameters.application["required_messages"] =(2 * Parameters.application["f"]) + 1
+
+        Parameters.compile()
     # this is the number of messages required to reach consensus
\ No newline at end of file
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+
+from Chain.Parameters import Parameters
+
+_code_version = None
+
+def code_version():
+    '''
+        hash of the simulator sources (Chain/**/*.py) - cached results are invalidated when the code changes
+    '''
+    global _code_version
+    if _code_version is None:
+        h = hashlib.sha256()
+        root = Path(__file__).parent
+        for path in sorted(root.rglob("*.py")):
+            h.update(str(path.relative_to(root)).encode())
+            h.update(path.read_bytes())
+        _code_version = h.hexdigest()
+
+    return _code_version
+
+def config_key(seed):
+    '''
+        key of a run: hash of the current Parameters (Parameters.export_state and the behaviour parameters -
+        every parameter Manager.modify can change), the seed and the code version
+    '''
+    state = dict(Parameters.export_state(), behaiviour=Parameters.behaiviour)
+    state = json.dumps(state, sort_keys=True, default=str)
+    return hashlib.sha256(f"{state}|{seed}|{code_version()}".encode()).hexdigest()
+
+class ResultCache:
+    '''
+        Persistent (SQLite) store of finished runs keyed by config_key
+
+        results: key -> seed, params (JSON), the result of the run (pickled - a cached result has the same types as
+            a fresh one) + the time it was stored
+    '''
+    def __init__(self, path="results.sqlite"):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, seed INTEGER, params TEXT, result BLOB, created REAL)"
+        )
+        self.db.commit()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get(self, key):
+        '''
+            returns the stored result for *key* (None on a miss)
+        '''
+        row = self.db.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+        return pickle.loads(row[0]) if row is not None else None
+
+    def put(self, key, seed, params, result):
+        self.db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+            (key, seed, json.dumps(params, default=str), pickle.dumps(result), time.time())
+        )
+        self.db.commit()
+
+    def clear(self):
+        self.db.execute("DELETE FROM results")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
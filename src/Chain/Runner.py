@@ -0,0 +1,161 @@
+'''
+    Runs batches of independent simulations (parameter sweeps / repeated seeds) in parallel worker processes
+
+    The parallelism is across runs - a single run is not split across processes.
+
+    A run is described by:
+        params: {parameter: value} applied with Manager.modify (on top of the loaded config)
+        seed: seed for random and numpy.random
+
+    Every run re-loads the config and re-seeds the generators before setting up the simulation so its
+    result only depends on (config, params, seed) - running it in a worker or sequentially (processes=1)
+    gives identical results.
+
+    Example (from src/):
+        runs = Runner.grid({"cp": ["PBFT", "BigFoot"], "Nn": [10, 20]}, seeds=[1, 2, 3])
+        results = Runner.run_all(runs, processes=4)
+
+    With cache (path of a SQLite file - see ResultCache) finished runs are stored keyed by the hash of
+    the configured Parameters, the seed and the code version - cached runs are returned without running.
+'''
+import itertools
+import multiprocessing
+import random
+
+import numpy
+
+import Chain.ResultCache as ResultCache
+import Chain.Datasets as Datasets
+
+# shorthands used in sweeps (same as blockchain.py / the notebooks)
+ALIASES = {
+    "cp": "init_CP",
+    "faulty_nodes": "crash_probs",
+    "num_byzantine": "byzantine_nodes",
+}
+
+def configure(params):
+    '''
+        Loads the config and applies *params* - returns the Manager (not set up)
+    '''
+    from Chain.Manager import Manager
+    from Chain.Parameters import Parameters
+    import Chain.tools as tools
+
+    manager = Manager()
+    tools.set_env_vars_from_config()
+    Parameters.load_params_from_config()
+
+    for param, value in params.items():
+        manager.modify(ALIASES.get(param, param), value)
+
+    return manager
+
+def key(params, seed):
+    '''
+        cache key of a run (see ResultCache.config_key)
+    '''
+    configure(params)
+    return ResultCache.config_key(seed)
+
+def run(params, seed):
+    '''
+        Runs a single simulation and returns its metrics (Metrics.metrics_result) together with params and seed
+        ("Nodes": per node summaries, "Export": prefix of the exported tables if the export is enabled - see Export.load)
+    '''
+    from Chain.Parameters import Parameters
+    from Chain.Metrics import SimulationState, Metrics
+    from Chain.SteadyState import SteadyState
+    from Chain.TimeSeries import TimeSeries
+
+    random.seed(seed)
+    numpy.random.seed(seed)
+
+    manager = configure(params)
+
+    # every run exports to its own files (<dir>/<run>_<key>_<table> - see Export)
+    export = Parameters.simulation["export"]
+    if export["enabled"]:
+        Parameters.simulation["export"] = dict(export, run=f"{export['run']}_{ResultCache.config_key(seed)[:16]}")
+
+    SimulationState.reset()
+    Metrics.reset()
+
+    manager.set_up()
+    manager.run()
+
+    SimulationState.store_state(manager.sim)
+    Metrics.measure_all(SimulationState.blockchain_state)
+
+    result = Metrics.metrics_result()
+    result["Blocks"] = max(n.blockchain_length() for n in manager.sim.nodes)
+    result["End Time"] = Parameters.simulation["simTime"]
+    result["Stopped"] = SteadyState.result["stopped"]
+    result["Nodes"] = [
+        {
+            "id": n.id,
+            "blocks": n.blockchain_length(),
+            "latency": Metrics.latency[n.id]["AVG"],
+            "throughput": Metrics.throughput[n.id],
+            "cp_messages": Metrics.CP[n.id],
+        }
+        for n in manager.sim.nodes
+    ]
+    result["Series"] = TimeSeries.to_serializable()
+    result.update(params)
+    result["seed"] = seed
+    if Parameters.simulation["export"]["enabled"]:
+        result["Export"] = Parameters.simulation["export"]["run"]
+
+    return result
+
+def _run(run_spec):
+    return run(run_spec["params"], run_spec["seed"])
+
+def grid(params, seeds):
+    '''
+        returns the runs for every combination of the values in *params* ({param: [values]}) and every seed
+    '''
+    keys = list(params.keys())
+    return [
+        {"params": dict(zip(keys, values)), "seed": seed}
+        for values in itertools.product(*(params[k] for k in keys))
+        for seed in seeds
+    ]
+
+def run_all(runs, processes=None, cache=None):
+    '''
+        Runs *runs* (list of {"params": {...}, "seed": int}) and returns their results in the same order
+
+        processes: number of worker processes (None: one per CPU, 1: run sequentially in this process)
+        Each worker process handles a single run (maxtasksperchild=1) so no module level state
+        (Parameters, BlockStore, Metrics...) is carried over between runs.
+
+        cache: path of the result cache (None: no caching) - only the runs missing from it are executed
+    '''
+    if cache is None:
+        return _execute(runs, processes)
+
+    store = ResultCache.ResultCache(cache)
+    try:
+        keys = [key(r["params"], r["seed"]) for r in runs]
+        results = [store.get(k) for k in keys]
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        for i, result in zip(missing, _execute([runs[i] for i in missing], processes)):
+            store.put(keys[i], runs[i]["seed"], runs[i]["params"], result)
+            results[i] = result
+    finally:
+        store.close()
+
+    return results
+
+def _execute(runs, processes):
+    if processes == 1 or len(runs) <= 1:
+        return [_run(r) for r in runs]
+
+    # the workers memory map the converted network datasets (instead of converting them concurrently)
+    Datasets.prepare()
+
+    with multiprocessing.Pool(processes, maxtasksperchild=1) as pool:
+        return pool.map(_run, runs, chunksize=1)
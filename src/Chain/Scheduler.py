@@ -14,13 +14,18 @@ class Scheduler:
         return event
 
     def schedule_event(self, creator, time, payload, handler, queue="main"):
-        # Schedules a local event
+        # Schedules a local event (queue: main, timer - CP timers, see TimerWheel - or sync)
         event = Event(handler, creator, time, payload)
 
         if queue == "main":
             payload["CP"] = creator.state.cp.NAME
+            event.cp_epoch = creator.state.cp_epoch
             creator.add_event(event)
+        elif queue == "timer":
+            payload["CP"] = creator.state.cp.NAME
+            event.cp_epoch = creator.state.cp_epoch
+            creator.arm_timer(event)
         elif queue == "sync":
-            creator.sync_queue.add_event(event)
+            creator.add_sync_event(event)
 
         return event
\ No newline at end of file
@@ -1,17 +1,35 @@
 from Chain.Node import Node
-from Chain.Block import Block
+from Chain.NodeTable import NodeTable
+from Chain.Block import Block, BlockStore
 from Chain.Transaction import TransactionFactory
 from Chain.Parameters import Parameters
 from Chain.EventQueue import Queue
+from Chain.FlightRecorder import FlightRecorder
+from Chain.SteadyState import SteadyState
+from Chain.TimeSeries import TimeSeries
+from Chain.TxLatency import TxLatency
+from Chain.Telemetry import Telemetry
+from Chain.Export import Export
 
 import Chain.Consensus.PBFT.PBFT as PBFT
 import Chain.Consensus.BigFoot.BigFoot as BigFoot
+import Chain.Consensus.FastPath as FastPath
 
 import Chain.tools as tools
 
 class Simulation:
     def __init__(self, config=None) -> None:
-        self.nodes = [Node(x) for x in range(Parameters.application["Nn"])]
+        BlockStore.reset()
+        FlightRecorder.init()
+        SteadyState.init()
+        TimeSeries.init()
+        TxLatency.init()
+        Telemetry.init()
+        Export.init()
+
+        NodeTable.init(Parameters.application["Nn"])
+        self.nodes = [Node.create(x) for x in range(Parameters.application["Nn"])]
+        FastPath.init(self)
 
         self.clock = 0
         
@@ -36,12 +54,15 @@ class Simulation:
 
     def get_next_event(self):
         # get next blockchain event
-        next_events = [
-            (x, x.next_event) for x in self.nodes 
-            if x.state.alive and x.next_event is not None
-        ]
-        ret = min(next_events, key=lambda x: x[1])
-        node, event = ret[0], ret[1]
+        if NodeTable.enabled:
+            node, event = NodeTable.next_node()
+        else:
+            next_events = [
+                (x, x.next_event) for x in self.nodes 
+                if x.state.alive and x.next_event is not None
+            ]
+            ret = min(next_events, key=lambda x: x[1])
+            node, event = ret[0], ret[1]
 
         # get next system event
         sys_event = self.system_queue.get_next_event()
@@ -56,7 +77,9 @@ class Simulation:
 
         self.clock = next_event.time
     
-        tools.debug_logs(msg=tools.print_global_eq(self, ret=True),
+        if tools.DEBUG_LEVEL >= tools.TRACE_FULL:
+            tools.debug_logs(msg=lambda: tools.print_global_eq(self, ret=True),
+                             level=tools.TRACE_FULL,
                              command=f"next -> {next_event} (enter to cont or give command): ",
                              simulator=self,
                              cmd_col=41,
@@ -0,0 +1,167 @@
+from array import array
+
+import numpy as np
+
+from Chain.Parameters import Parameters
+
+# two sided 95% student-t quantiles (degrees of freedom 1..30 - normal quantile above)
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+def t_95(df):
+    return T_95[df-1] if df <= len(T_95) else 1.96
+
+def mser5(values):
+    '''
+        MSER-5 warm-up deletion: returns the number of leading observations to discard
+
+        The series is averaged in batches of 5 and the truncation point d (in batches, over the first half)
+        minimising the MSER statistic  sum((z_i - mean(z_d:))^2) / (k-d)^2  is chosen
+    '''
+    k = len(values) // 5
+    if k < 2:
+        return 0
+
+    z = np.asarray(values[:k*5]).reshape(k, 5).mean(axis=1)
+
+    # suffix sums - statistic for every truncation point in one pass
+    n = np.arange(k, 0, -1)
+    sums = np.cumsum(z[::-1])[::-1]
+    sq_sums = np.cumsum((z*z)[::-1])[::-1]
+    mser = (sq_sums - sums*sums / n) / (n*n)
+
+    return int(np.argmin(mser[:k//2 + 1])) * 5
+
+def batch_means(values, batches):
+    '''
+        returns (mean, 95% CI half width) of *values* using *batches* non overlapping batch means
+    '''
+    size = len(values) // batches
+    means = np.asarray(values[len(values) - size*batches:]).reshape(batches, size).mean(axis=1)
+
+    return means.mean(), t_95(batches-1) * means.std(ddof=1) / np.sqrt(batches)
+
+class SteadyState:
+    '''
+        Online steady-state detection and early termination (Parameters.simulation["steady_state"])
+
+        Every block is observed once - when it is first added to the chain of any node:
+            latency: mean confirmation latency of its transactions
+            commit time and number of transactions (throughput)
+
+        Every *check_every* blocks MSER-5 removes the warm-up from the latency series and
+        batch means give 95% confidence intervals on block latency and on throughput
+        (transactions / time covered by each batch). The run can stop (Manager.run) once
+        both relative CI half widths are within *ci_target*, or when no block was committed
+        for *stall* simulated seconds.
+
+        result: summary of the last analysis (and the reason the run stopped - None if it did not)
+    '''
+    enabled = False
+    batches = 10
+    ci_target = 0.05
+    min_blocks = 50
+    check_every = 10
+    stall = 0
+
+    latencies = array('d')
+    times = array('d')
+    txs = array('d')
+    last_commit = 0
+    next_check = 0
+
+    result = None
+
+    @staticmethod
+    def init():
+        params = Parameters.simulation["steady_state"]
+
+        SteadyState.enabled = params["enabled"]
+        SteadyState.batches = params["batches"]
+        SteadyState.ci_target = params["ci_target"]
+        SteadyState.min_blocks = params["min_blocks"]
+        SteadyState.check_every = params["check_every"]
+        SteadyState.stall = params["stall"]
+
+        SteadyState.latencies = array('d')
+        SteadyState.times = array('d')
+        SteadyState.txs = array('d')
+        SteadyState.last_commit = 0
+        SteadyState.next_check = SteadyState.min_blocks
+
+        SteadyState.result = {"stopped": None}
+
+    @staticmethod
+    def note_block(block, time):
+        '''
+            observes the committed *block* (see Node.note_first_commit)
+        '''
+        SteadyState.last_commit = time
+
+        if block.transactions:
+            SteadyState.latencies.append(time - sum(tx.timestamp for tx in block.transactions) / len(block.transactions))
+            SteadyState.times.append(time)
+            SteadyState.txs.append(len(block.transactions))
+
+    @staticmethod
+    def analyse():
+        '''
+            MSER-5 warm-up deletion + batch means CIs over the observed blocks (None if there are too few)
+        '''
+        warmup = mser5(SteadyState.latencies)
+        start = max(warmup, 1)
+
+        n = len(SteadyState.latencies) - start
+        if n < max(SteadyState.batches * 2, 2):
+            return None
+
+        lat_mean, lat_hw = batch_means(SteadyState.latencies[start:], SteadyState.batches)
+
+        # throughput of each batch: transactions committed / time since the end of the previous batch
+        size = n // SteadyState.batches
+        first = len(SteadyState.latencies) - size * SteadyState.batches
+        times = np.asarray(SteadyState.times[first-1:])
+        txs = np.asarray(SteadyState.txs[first:])
+        ends = np.arange(size, len(times), size)
+        spans = times[ends] - times[ends - size]
+        batch_tps = np.add.reduceat(txs, ends - size) / np.where(spans > 0, spans, np.nan)
+
+        tp_mean = np.nanmean(batch_tps)
+        tp_hw = t_95(SteadyState.batches-1) * np.nanstd(batch_tps, ddof=1) / np.sqrt(SteadyState.batches)
+
+        return {
+            "warmup_blocks": warmup,
+            "blocks": n,
+            "latency": (float(lat_mean), float(lat_hw)),
+            "throughput": (float(tp_mean), float(tp_hw)),
+        }
+
+    @staticmethod
+    def should_stop(clock):
+        '''
+            returns the reason the run should stop at *clock* (None to continue)
+        '''
+        if not SteadyState.enabled:
+            return None
+
+        if SteadyState.stall and clock - SteadyState.last_commit > SteadyState.stall:
+            SteadyState.result["stopped"] = f"stall: no block committed since {round(SteadyState.last_commit, 3)}"
+            return SteadyState.result["stopped"]
+
+        if len(SteadyState.latencies) < SteadyState.next_check:
+            return None
+
+        SteadyState.next_check = len(SteadyState.latencies) + SteadyState.check_every
+
+        analysis = SteadyState.analyse()
+        if analysis is None:
+            return None
+
+        SteadyState.result.update(analysis)
+
+        if all(hw <= SteadyState.ci_target * abs(mean) for mean, hw in (analysis["latency"], analysis["throughput"])):
+            SteadyState.result["stopped"] = "steady state: CI half width target met"
+            return SteadyState.result["stopped"]
+
+        return None
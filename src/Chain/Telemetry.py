@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from Chain.Parameters import Parameters
+
+class Telemetry:
+    '''
+        Optional live progress telemetry for long runs (Parameters.simulation["telemetry"])
+
+        Every *interval* wall clock seconds a snapshot (Prometheus text format) of
+            events handled / events per second, simulated clock and simulated seconds per wall second,
+            queue, timer, sync queue and backlog sizes, mempool depth, memory (max RSS) and chain height
+        is appended to a rotating file (*path*, *max_bytes*, *backups*) and, if *http_port* is set,
+        served at http://127.0.0.1:<http_port>/metrics
+
+        The file and the server are (re)opened by every init (close), so each run uses its own path / port
+
+        Throttled: the wall clock is only read every *check_every* events so the cost per event is a counter increment
+    '''
+    enabled = False
+    interval = 5
+    check_every = 1000
+
+    events = 0
+    next_check = 0
+    last_time = 0
+    last_events = 0
+    last_clock = 0
+    start_time = 0
+
+    snapshot = ""
+    logger = None
+    handler = None
+    server = None
+
+    @staticmethod
+    def init():
+        params = Parameters.simulation["telemetry"]
+
+        Telemetry.enabled = params["enabled"]
+        Telemetry.interval = params["interval"]
+        Telemetry.check_every = params["check_every"]
+
+        Telemetry.events = 0
+        Telemetry.next_check = Telemetry.check_every
+        Telemetry.start_time = Telemetry.last_time = time.monotonic()
+        Telemetry.last_events = 0
+        Telemetry.last_clock = 0
+        Telemetry.snapshot = ""
+
+        # file / server of an earlier run in this process
+        Telemetry.close()
+
+        if not Telemetry.enabled:
+            return
+
+        Telemetry.logger = logging.getLogger("Chain.Telemetry")
+        Telemetry.logger.propagate = False
+        Telemetry.logger.setLevel(logging.INFO)
+        Telemetry.handler = RotatingFileHandler(params["path"], maxBytes=params["max_bytes"], backupCount=params["backups"])
+        Telemetry.logger.addHandler(Telemetry.handler)
+
+        if params["http_port"]:
+            Telemetry.serve(params["http_port"])
+
+    @staticmethod
+    def close():
+        '''
+            closes the rotating file and stops the HTTP server
+        '''
+        if Telemetry.handler is not None:
+            Telemetry.logger.removeHandler(Telemetry.handler)
+            Telemetry.handler.close()
+            Telemetry.handler = None
+        Telemetry.logger = None
+
+        if Telemetry.server is not None:
+            Telemetry.server.shutdown()
+            Telemetry.server.server_close()
+            Telemetry.server = None
+
+    @staticmethod
+    def tick(sim):
+        '''
+            called once per handled event (Manager.run)
+        '''
+        Telemetry.events += 1
+
+        if Telemetry.events < Telemetry.next_check:
+            return
+        Telemetry.next_check = Telemetry.events + Telemetry.check_every
+
+        if time.monotonic() - Telemetry.last_time >= Telemetry.interval:
+            Telemetry.publish(sim)
+
+    @staticmethod
+    def measure(sim):
+        now = time.monotonic()
+        elapsed = max(now - Telemetry.last_time, 1e-9)
+
+        alive = [n for n in sim.nodes if n.state.alive]
+        metrics = {
+            "events_total": Telemetry.events,
+            "events_per_second": (Telemetry.events - Telemetry.last_events) / elapsed,
+            "sim_clock_seconds": sim.clock,
+            "sim_seconds_per_second": (sim.clock - Telemetry.last_clock) / elapsed,
+            "wall_seconds": now - Telemetry.start_time,
+            "queue_events": sum(n.queue.size() for n in sim.nodes),
+            "timer_events": sum(len(n.timers) for n in sim.nodes),
+            "sync_queue_events": sum(n.sync_queue.size() for n in sim.nodes),
+            "system_queue_events": sim.system_queue.size(),
+            "backlog_events": sum(len(n.backlog) for n in sim.nodes),
+            "mempool_transactions": max(len(n.pool) for n in sim.nodes),
+            "chain_height": max(n.blockchain.height for n in sim.nodes),
+            "nodes_alive": len(alive),
+        }
+
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux
+            metrics["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+        Telemetry.last_time = now
+        Telemetry.last_events = Telemetry.events
+        Telemetry.last_clock = sim.clock
+
+        return metrics
+
+    @staticmethod
+    def publish(sim):
+        metrics = Telemetry.measure(sim)
+
+        Telemetry.snapshot = "".join(
+            f"# TYPE bcsim_{name} gauge\nbcsim_{name} {value}\n" for name, value in metrics.items()
+        )
+
+        if Telemetry.logger is not None:
+            Telemetry.logger.info(f"# time {time.time()}\n{Telemetry.snapshot}")
+
+        return metrics
+
+    @staticmethod
+    def serve(port):
+        '''
+            serves the latest snapshot on localhost:*port* from a daemon thread
+        '''
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = Telemetry.snapshot.encode()
+                self.send_response(200 if self.path in ("/", "/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        Telemetry.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=Telemetry.server.serve_forever, daemon=True).start()
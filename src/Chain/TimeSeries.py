@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+
+from Chain.Parameters import Parameters
+
+class TimeSeries:
+    '''
+        Per interval (bucket) time series accumulated during the run (Parameters.simulation["time_series"])
+
+        Buckets of *bucket* simulated seconds are preallocated for the whole simTime (the last bucket ends at
+        simTime - it may be shorter - and also counts the events past simTime):
+            txs: transactions committed (first time a block is added to any chain)
+            blocks: blocks committed
+            latency_sum: sum of the confirmation latency of the committed transactions
+            messages: messages sent
+
+        markers: (time, label) of CP changes and node faults/recoveries - to line up throughput dips
+    '''
+    bucket = 10
+    size = 0
+
+    txs = None
+    blocks = None
+    latency_sum = None
+    messages = None
+
+    markers = []
+
+    @staticmethod
+    def init():
+        TimeSeries.bucket = Parameters.simulation["time_series"]["bucket"]
+        TimeSeries.size = max(math.ceil(Parameters.simulation["simTime"] / TimeSeries.bucket), 1)
+
+        TimeSeries.txs = np.zeros(TimeSeries.size, dtype=np.int64)
+        TimeSeries.blocks = np.zeros(TimeSeries.size, dtype=np.int64)
+        TimeSeries.latency_sum = np.zeros(TimeSeries.size)
+        TimeSeries.messages = np.zeros(TimeSeries.size, dtype=np.int64)
+
+        TimeSeries.markers = []
+
+    @staticmethod
+    def index(time):
+        return min(int(time // TimeSeries.bucket), TimeSeries.size - 1)
+
+    @staticmethod
+    def note_block(block, time):
+        '''
+            counts the committed *block* (see Node.note_first_commit)
+        '''
+        idx = TimeSeries.index(time)
+        TimeSeries.blocks[idx] += 1
+        TimeSeries.txs[idx] += len(block.transactions)
+        TimeSeries.latency_sum[idx] += sum(time - tx.timestamp for tx in block.transactions)
+
+    @staticmethod
+    def note_message(time, count=1):
+        TimeSeries.messages[TimeSeries.index(time)] += count
+
+    @staticmethod
+    def note_marker(time, label):
+        TimeSeries.markers.append((time, label))
+
+    @staticmethod
+    def series():
+        '''
+            returns the time series (numpy arrays indexed by bucket)
+                time: start of each bucket
+                throughput: committed transactions / s
+                latency: mean confirmation latency of the transactions committed in the bucket (nan if none)
+                block_rate, message_rate: blocks / s, messages / s
+            rates are per second of the bucket up to simTime (nan for the buckets after a run stopped early - see SteadyState)
+        '''
+        time = np.arange(TimeSeries.size) * TimeSeries.bucket
+        width = np.clip(Parameters.simulation["simTime"] - time, 0, TimeSeries.bucket).astype(float)
+        width[width == 0] = np.nan
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            latency = TimeSeries.latency_sum / TimeSeries.txs
+
+        return {
+            "time": time,
+            "throughput": TimeSeries.txs / width,
+            "latency": np.where(TimeSeries.txs > 0, latency, np.nan),
+            "block_rate": TimeSeries.blocks / width,
+            "message_rate": TimeSeries.messages / width,
+        }
+
+    @staticmethod
+    def to_serializable():
+        return {
+            "bucket": TimeSeries.bucket,
+            "series": {k: v.tolist() for k, v in TimeSeries.series().items()},
+            "markers": TimeSeries.markers,
+        }
@@ -0,0 +1,82 @@
+import heapq
+
+from Chain.Parameters import Parameters
+
+class TimerWheel:
+    '''
+        Hashed timing wheel holding the (cancel heavy) CP timers of a node - i.e timeout, fast_path_timeout
+
+        Timers are hashed into slots by their tick (time // resolution). Arming a timer or
+        cancelling it (by reference) is O(1); the heap of ticks only grows when a new slot is used
+        and empty slots are skipped lazily when looking for the next timer.
+
+        slots: tick -> {id(event): event} (insertion ordered - ties are handled in arming order)
+        ticks: heap of the ticks of the used slots
+        resolution: width of a slot in simulated seconds (Parameters.execution["timer_resolution"])
+    '''
+    def __init__(self, resolution=None):
+        self.resolution = Parameters.execution["timer_resolution"] if resolution is None else resolution
+        self.slots = {}
+        self.ticks = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for tick in sorted(self.slots):
+            yield from sorted(self.slots[tick].values(), key=lambda x: x.time)
+
+    def tick(self, time):
+        return int(time // self.resolution)
+
+    def arm(self, event):
+        tick = self.tick(event.time)
+
+        slot = self.slots.get(tick)
+        if slot is None:
+            slot = self.slots[tick] = {}
+            heapq.heappush(self.ticks, tick)
+
+        slot[id(event)] = event
+        self.count += 1
+
+    def cancel(self, event):
+        '''
+            removes *event* if it is armed - returns True if it was
+        '''
+        slot = self.slots.get(self.tick(event.time))
+        if slot is None or slot.pop(id(event), None) is None:
+            return False
+
+        self.count -= 1
+        return True
+
+    def _first_slot(self):
+        # drop the (lazily) emptied slots in front of the wheel
+        while self.ticks:
+            slot = self.slots[self.ticks[0]]
+            if slot:
+                return slot
+            del self.slots[heapq.heappop(self.ticks)]
+        return None
+
+    @property
+    def time_next(self):
+        event = self.get_next_event()
+        return event.time if event is not None else None
+
+    def get_next_event(self):
+        slot = self._first_slot()
+        return min(slot.values(), key=lambda x: x.time) if slot is not None else None
+
+    def pop_next_event(self):
+        event = self.get_next_event()
+        del self.slots[self.ticks[0]][id(event)]
+        self.count -= 1
+        return event
+
+    def clear(self):
+        self.slots = {}
+        self.ticks = []
+        self.count = 0
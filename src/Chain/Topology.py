@@ -0,0 +1,180 @@
+'''
+    Topology generators for the peer to peer network (Network.assign_neighbours)
+
+    Every generator works on node indices 0..N-1 in O(N*k) (no per node candidate lists) and returns the
+    adjacency in CSR form (indptr, indices): the neighbours of node i are indices[indptr[i]:indptr[i+1]].
+
+        random_neighbours: k random out neighbours per node (gossip - same draws as random.sample over the other nodes)
+        watts_strogatz: ring lattice (k/2 on each side) with every edge rewired with probability beta (smallworld)
+        random_regular: undirected graph where every node has exactly k neighbours
+        scale_free: Barabasi-Albert preferential attachment (m = k/2 edges per new node)
+        k_nearest: k lowest delay out neighbours per node (lattice - argpartition on the delay rows)
+
+    Randomness comes from the random module (seeded per run like the rest of the simulator).
+'''
+import random
+
+import numpy as np
+
+def to_csr(neighbours):
+    '''
+        CSR (indptr, indices) of a list of neighbour lists
+    '''
+    indptr = np.zeros(len(neighbours) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(n) for n in neighbours])
+    indices = np.fromiter((j for n in neighbours for j in n), dtype=np.int64, count=int(indptr[-1]))
+
+    return indptr, indices
+
+def from_edges(N, edges):
+    '''
+        CSR of the undirected graph with the given (u, v) edges (neighbours in ascending order)
+    '''
+    edges = np.asarray(list(edges), dtype=np.int64).reshape(-1, 2)
+    src = np.concatenate((edges[:, 0], edges[:, 1]))
+    dst = np.concatenate((edges[:, 1], edges[:, 0]))
+
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(N + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(src, minlength=N))
+
+    return indptr, dst[order]
+
+def neighbours(csr, i):
+    indptr, indices = csr
+    return indices[indptr[i]:indptr[i + 1]]
+
+def sample_others(N, i, k):
+    '''
+        k distinct random nodes other than i - same draws as random.sample([j for j in range(N) if j != i], k)
+    '''
+    return [j if j < i else j + 1 for j in random.sample(range(N - 1), k)]
+
+def random_neighbours(N, k):
+    if N <= k:
+        raise ValueError("Not enough nodes to sample from")
+
+    return to_csr([sample_others(N, i, k) for i in range(N)])
+
+def watts_strogatz(N, k, beta):
+    '''
+        Watts-Strogatz small world graph (k rounded down to even)
+    '''
+    half = k // 2
+    if N <= 2 * half:
+        raise ValueError("Not enough nodes to sample from")
+
+    ring = [(u, (u + j) % N) for j in range(1, half + 1) for u in range(N)]
+    edges = {(min(u, v), max(u, v)) for u, v in ring}
+    degree = np.full(N, 2 * half)
+
+    for u, v in ring:
+        if random.random() >= beta or degree[u] >= N - 1:
+            continue
+
+        # rewire (u, v) to (u, w) avoiding self loops and duplicate edges
+        w = random.randrange(N)
+        while w == u or (min(u, w), max(u, w)) in edges:
+            w = random.randrange(N)
+
+        edges.remove((min(u, v), max(u, v)))
+        edges.add((min(u, w), max(u, w)))
+        degree[v] -= 1
+        degree[w] += 1
+
+    return from_edges(N, edges)
+
+def random_regular(N, k):
+    '''
+        random k-regular graph: random pairing of the N*k edge stubs, then the self loops and duplicate edges
+        are removed with degree preserving swaps with random valid edges (their number does not grow with N)
+    '''
+    if N <= k or (N * k) % 2:
+        raise ValueError("A k-regular graph needs N > k and N*k even")
+
+    stubs = [u for u in range(N) for _ in range(k)]
+    random.shuffle(stubs)
+
+    edges = set()
+    bad = []
+    for u, v in zip(stubs[::2], stubs[1::2]):
+        e = (min(u, v), max(u, v))
+        if u == v or e in edges:
+            bad.append(e)
+        else:
+            edges.add(e)
+
+    pool = list(edges)
+    attempts = 0
+    while bad:
+        attempts += 1
+        if attempts > 1000 * (len(bad) + k):
+            raise ValueError("Could not generate a k-regular graph")
+
+        u, v = bad[-1]
+        e = pool[random.randrange(len(pool))]
+        if e not in edges:
+            continue
+        x, y = e if random.random() < 0.5 else e[::-1]
+
+        # (u, v) + (x, y) -> (u, x) + (v, y)
+        a, b = (min(u, x), max(u, x)), (min(v, y), max(v, y))
+        if u == x or v == y or a == b or a in edges or b in edges:
+            continue
+
+        edges.remove(e)
+        edges.update((a, b))
+        pool.extend((a, b))
+        bad.pop()
+
+    return from_edges(N, edges)
+
+def scale_free(N, k):
+    '''
+        Barabasi-Albert graph: every new node attaches to m = max(k // 2, 1) existing nodes chosen
+        proportionally to their degree (repeated node list)
+    '''
+    m = max(k // 2, 1)
+    if N <= m:
+        raise ValueError("Not enough nodes to sample from")
+
+    edges = []
+    repeated = []
+    targets = list(range(m))
+
+    for u in range(m, N):
+        edges.extend((t, u) for t in targets)
+        repeated.extend(targets)
+        repeated.extend([u] * m)
+
+        chosen = set()
+        while len(chosen) < m:
+            chosen.add(repeated[random.randrange(len(repeated))])
+        targets = list(chosen)
+
+    return from_edges(N, edges)
+
+def k_nearest(N, delays, k, rows=None, chunk=1024):
+    '''
+        k lowest delay out neighbours of the nodes in *rows* (default: every node) - ties: lowest index first
+        (as a stable sort of the delays)
+
+        delays(rows): delay matrix (row node -> each of the N nodes) of the given rows - calculated in chunks of *chunk* rows
+    '''
+    rows = np.arange(N) if rows is None else np.asarray(rows)
+    kk = min(k, N - 1)
+
+    result = []
+    for start in range(0, len(rows), chunk):
+        block = rows[start:start + chunk]
+        d = np.array(delays(block), dtype=float)
+        d[np.arange(len(block)), block] = np.inf
+
+        kth = np.partition(d, kk - 1, axis=1)[:, kk - 1]
+
+        for row, value in zip(d, kth):
+            candidates = np.flatnonzero(row <= value)
+            order = np.lexsort((candidates, row[candidates]))
+            result.append(candidates[order[:kk]].tolist())
+
+    return to_csr(result)
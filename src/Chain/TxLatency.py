@@ -0,0 +1,103 @@
+import math
+
+import numpy as np
+
+from Chain.Parameters import Parameters
+
+class TxLatency:
+    '''
+        Per transaction confirmation latency (Parameters.simulation["tx_latency"])
+
+        A transaction is confirmed when the block including it is
+            first: added to the chain of the first node
+            quorum: added to the chains of required_messages nodes
+        (mode), and its latency is confirmation time - transaction timestamp.
+
+        latency: latency of each transaction indexed by the transaction id (TransactionFactory) - nan if not confirmed
+        histogram: log bucketed latency counts (bucket i covers [MIN * GAMMA^i, MIN * GAMMA^(i+1)) - relative error
+            of the percentiles < GAMMA - 1) - fixed size no matter how many transactions are confirmed
+    '''
+    MIN = 1e-3
+    MAX = 1e6
+    GAMMA = 1.01
+    BUCKETS = math.ceil(math.log(MAX / MIN) / math.log(GAMMA)) + 1
+
+    mode = "first"
+
+    latency = None
+    histogram = None
+    confirmed = 0
+
+    adds = None
+
+    @staticmethod
+    def init():
+        TxLatency.mode = Parameters.simulation["tx_latency"]["mode"]
+
+        TxLatency.latency = np.full(1024, np.nan)
+        TxLatency.histogram = np.zeros(TxLatency.BUCKETS, dtype=np.int64)
+        TxLatency.confirmed = 0
+
+        TxLatency.adds = np.zeros(1024, dtype=np.int32)
+
+    @staticmethod
+    def note_add(block, time):
+        '''
+            called every time a node adds *block* to its chain - through the CP or a sync (quorum mode)
+        '''
+        if TxLatency.mode != "quorum":
+            return
+
+        if block.key >= len(TxLatency.adds):
+            TxLatency.adds = np.concatenate((TxLatency.adds, np.zeros(len(TxLatency.adds), dtype=np.int32)))
+
+        TxLatency.adds[block.key] += 1
+        if TxLatency.adds[block.key] == Parameters.application["required_messages"] and block.transactions:
+            TxLatency.confirm(block.transactions, time)
+
+    @staticmethod
+    def note_block(block, time):
+        '''
+            called once per committed *block* (first mode - see Node.note_first_commit)
+        '''
+        if TxLatency.mode == "first" and block.transactions:
+            TxLatency.confirm(block.transactions, time)
+
+    @staticmethod
+    def confirm(transactions, time):
+        '''
+            confirms *transactions* at *time* - a transaction included in several blocks is confirmed (and counted) once
+        '''
+        ids = np.fromiter((tx.id for tx in transactions), dtype=np.int64, count=len(transactions))
+        timestamps = np.fromiter((tx.timestamp for tx in transactions), dtype=np.float64, count=len(transactions))
+
+        if ids.max() >= len(TxLatency.latency):
+            size = max(len(TxLatency.latency) * 2, int(ids.max()) + 1)
+            TxLatency.latency = np.concatenate((TxLatency.latency, np.full(size - len(TxLatency.latency), np.nan)))
+
+        ids, first = np.unique(ids, return_index=True)
+        new = np.isnan(TxLatency.latency[ids])
+        ids = ids[new]
+        if len(ids) == 0:
+            return
+        latencies = time - timestamps[first[new]]
+
+        TxLatency.latency[ids] = latencies
+        TxLatency.confirmed += len(ids)
+
+        idx = np.log(np.clip(latencies, TxLatency.MIN, TxLatency.MAX) / TxLatency.MIN) / math.log(TxLatency.GAMMA)
+        np.add.at(TxLatency.histogram, np.minimum(idx.astype(np.int64), TxLatency.BUCKETS - 1), 1)
+
+    @staticmethod
+    def percentiles(qs=(50, 90, 99, 99.9)):
+        '''
+            returns {q: latency} estimated from the histogram (geometric centre of the bucket holding the q-th percentile)
+        '''
+        if TxLatency.confirmed == 0:
+            return {q: float("nan") for q in qs}
+
+        cumulative = np.cumsum(TxLatency.histogram)
+        ranks = np.ceil(np.asarray(qs) / 100 * TxLatency.confirmed)
+        buckets = np.searchsorted(cumulative, np.maximum(ranks, 1))
+
+        return {q: float(TxLatency.MIN * TxLatency.GAMMA ** (b + 0.5)) for q, b in zip(qs, buckets)}
@@ -4,10 +4,50 @@ import sys
 import yaml
 
 from Chain.Parameters import Parameters
+from Chain.FlightRecorder import FlightRecorder
+
+########################## TRACING ###########################
+'''
+    Debug output is gated by DEBUG_LEVEL which is read once (set_env_vars_from_config/set_debug)
+    instead of checking the enviroment on every call:
+        TRACE_OFF:  no debug output (headless runs)
+        TRACE_INFO: debug messages only
+        TRACE_FULL: debug messages + global state dump and command prompt on every event ('debug: True')
+
+    Hot paths should check the level before building debug output:
+        if tools.DEBUG_LEVEL >= tools.TRACE_FULL:
+            tools.debug_logs(msg=lambda: expensive_string(), level=tools.TRACE_FULL)
+'''
+TRACE_OFF = 0
+TRACE_INFO = 1
+TRACE_FULL = 2
+
+def parse_debug_level(value):
+    '''
+        converts the 'debug' setting ("True"/"False" or a level) to a tracing level
+    '''
+    if value == "True":
+        return TRACE_FULL
+    elif value == "False" or value is None:
+        return TRACE_OFF
+
+    return int(value)
+
+DEBUG_LEVEL = TRACE_OFF if "nd" in sys.argv else parse_debug_level(os.environ.get("debug"))
+
+def set_debug(value):
+    '''
+        Sets the tracing level (and the 'debug' enviroment variable) - "nd" as a cmd arg disables debugging
+    '''
+    global DEBUG_LEVEL
+    os.environ["debug"] = str(value)
+    DEBUG_LEVEL = TRACE_OFF if "nd" in sys.argv else parse_debug_level(str(value))
 
-def debug_logs(msg, **kwargs):
+def debug_logs(msg, level=TRACE_INFO, **kwargs):
     '''
         must set enviroment variable 'debug' to true (env_vars.yaml)] (can overwrite with nd as cmd arg)
+        msg can be a callable returning the message (only called if the message will be printed)
+        level: minimum tracing level (DEBUG_LEVEL) for the message to be printed
         colors: 
             40:black
             41:red
@@ -19,7 +59,10 @@ def debug_logs(msg, **kwargs):
             47:white
     '''
 
-    if os.environ['debug'] == "True"  and "nd" not in sys.argv:
+    if DEBUG_LEVEL >= level:
+        if callable(msg):
+            msg = msg()
+
         if 'col' in kwargs:
             msg = color(msg, kwargs["col"])
 
@@ -69,13 +112,15 @@ def set_env_vars_from_config(name="env_vars.yaml"):
 
         os.environ[name] = str(d)
 
-    # enable/disable debug from cmd ("True"/"False")
+    # enable/disable debug from cmd ("True"/"False" or a tracing level)
     if debug := get_named_cmd_arg("--debug"):
         os.environ["debug"] = debug
     
     if '--debug_at' in sys.argv:
             os.environ["start_debug"] = get_named_cmd_arg('--debug_at')
             os.environ["debug"] = "False"
+
+    set_debug(os.environ.get("debug", "False"))
     
 def exec_cmd(simulator, cmd):
     ''' When debug mode is on - a command can be given as input (this handles the execution)'''
@@ -99,6 +144,8 @@ def exec_cmd(simulator, cmd):
         simulator.nodes[node].state.cp_state.round.round = round
         simulator.nodes[node].state.cp_state.timeout.payload['round'] = round
         return f"Set nodes {node} round to {round}"
+    elif cmd[0] == "dump":
+        return f"Flight recorder written to {FlightRecorder.dump('debug command')}"
     elif cmd[0] == "stop":
         exit()
     elif cmd[0] == "CP":
@@ -120,6 +167,7 @@ def global_event_queue(simulator):
     for n in simulator.bps:
         for e in reversed(n.queue.event_list):
             queue.append(e)
+        queue.extend(n.timers)
 
     return sorted(queue)
 
@@ -140,6 +188,9 @@ def print_global_eq(simulator, ret=False, indiv=True):
                 s += color(n.__str__(), 41) + '\n'
             for e in reversed(n.queue.event_list):
                 s += "\t" + e.__str__() + '\n'
+            s += color("timers", 46) + '\n'
+            for e in reversed(list(n.timers)):
+                s += "\t" + e.__str__() + '\n'
             s += color("syncMSG", 44) + '\n'
             for e in reversed(n.sync_queue.event_list):
                 s += "\t" + e.__str__() + '\n'
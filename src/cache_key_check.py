@@ -0,0 +1,100 @@
+'''
+    Result cache key check: fails if changing a parameter (Manager.modify) does not change the cache key of a run
+    (ResultCache.config_key) - a cached run would be returned for a different configuration
+
+    Every parameter of every section Manager.modify writes to is changed in turn (the Runner aliases as well).
+    Also checks that a cached result is returned with the types of a fresh one.
+
+    Run from src/:
+        python cache_key_check.py
+'''
+import os
+import sys
+import tempfile
+
+import Chain.Runner as Runner
+import Chain.ResultCache as ResultCache
+from Chain.Parameters import Parameters
+
+# sections in the order Manager.modify looks a parameter up
+SECTIONS = ("simulation", "application", "execution", "behaiviour", "network", "BigFoot", "PBFT")
+
+# behaviour parameters Manager.modify sets through a number
+NUMBERS = ("byzantine_nodes", "crash_probs")
+
+def changed(param, value):
+    '''
+        a value of *param* different from *value*
+    '''
+    if param in NUMBERS:
+        return 1
+    if isinstance(value, bool):
+        return not value
+    if isinstance(value, (int, float)):
+        return value + 1
+    if isinstance(value, str):
+        return value + "_changed"
+    if isinstance(value, list):
+        return value + ["changed"]
+    if isinstance(value, dict):
+        return dict(value, changed=True)
+    return "changed"
+
+def parameters():
+    '''
+        {param: value} of every parameter Manager.modify can change (first section wins, as in Manager.modify)
+    '''
+    Runner.configure({})
+    params = {}
+    for section in SECTIONS:
+        for param, value in getattr(Parameters, section).items():
+            # the only behaviour parameters Manager.modify accepts
+            if section == "behaiviour" and param not in NUMBERS:
+                continue
+            params.setdefault(param, value)
+
+    return params
+
+def check_keys():
+    base = Runner.key({}, 1)
+    same = []
+    for param, value in parameters().items():
+        # Nn derived parameters (f, required_messages) are recalculated by Manager.modify
+        if param in ("f", "required_messages"):
+            continue
+        if Runner.key({param: changed(param, value)}, 1) == base:
+            same.append(param)
+
+    for alias in Runner.ALIASES:
+        if Runner.key({alias: changed(Runner.ALIASES[alias], None)}, 1) == base:
+            same.append(alias)
+
+    if Runner.key({}, 2) == base:
+        same.append("seed")
+
+    return same
+
+def check_types():
+    '''
+        True if a cached result is equal to (and has the types of) the fresh result
+    '''
+    result = {"Average Latency": 1.5, "Blocks": 3, "Stopped": None, "Nodes": [{"id": 0, "blocks": 3}], "Series": (1, 2.0)}
+    with tempfile.TemporaryDirectory() as directory:
+        store = ResultCache.ResultCache(os.path.join(directory, "results.sqlite"))
+        store.put("key", 1, {}, result)
+        cached = store.get("key")
+        store.close()
+
+    return cached == result and type(cached["Series"]) is tuple
+
+def main():
+    same = check_keys()
+    if same:
+        sys.exit(f"cache key does not change with: {', '.join(same)}")
+    if not check_types():
+        sys.exit("cached results do not keep their types")
+
+    print("ok")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+'''
+    Node table check: runs the same simulation with and without the node table (Parameters.execution["node_table"])
+    and fails if the results differ
+
+    Every node is a validator, the hybrid engine (FastPath) is used and a node is removed (Manager.remove_node)
+    part way through the run, so the fast rounds after the removal are compared as well.
+    Each mode runs in a fresh interpreter.
+
+    Run from src/:
+        python node_table_check.py [seed] [Nn] [simTime]
+'''
+import json
+import subprocess
+import sys
+
+RUN = '''
+import json, random, sys
+import numpy as np
+import Chain.tools as tools
+import Chain.Consensus.FastPath as FastPath
+from Chain.Manager import Manager
+from Chain.Parameters import Parameters
+
+seed, Nn, sim_time, node_table = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]), sys.argv[4] == "True"
+random.seed(seed)
+np.random.seed(seed)
+
+m = Manager()
+tools.set_env_vars_from_config()
+Parameters.load_params_from_config()
+for param, value in (("Nn", Nn), ("alpha", 1), ("init_CP", "PBFT"), ("type", "broadcast"), ("simTime", sim_time),
+                     ("crash_probs", 0), ("byzantine_nodes", 0), ("engine", "hybrid"), ("node_table", node_table)):
+    m.modify(param, value)
+m.set_up()
+
+# the first third of the run, the node removal, then the rest of the run
+while m.sim.clock <= sim_time / 3:
+    m.sim.sim_next_event()
+    m.update_sim()
+m.remove_node()
+m.run()
+
+print(json.dumps({
+    "fast_rounds": FastPath.rounds,
+    "blocks": [n.blockchain_length() for n in m.sim.nodes],
+    "chain": [b.id for b in m.sim.nodes[0].blockchain[1:]],
+    "messages": [n.total_messages for n in m.sim.nodes],
+}))
+'''
+
+def run(seed, Nn, sim_time, node_table):
+    out = subprocess.run([sys.executable, "-c", RUN, str(seed), str(Nn), str(sim_time), str(node_table)],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().split("\n")[-1])
+
+def main(seed=5, Nn=10, sim_time=300):
+    objects = run(seed, Nn, sim_time, False)
+    table = run(seed, Nn, sim_time, True)
+
+    print(f"fast rounds:  objects {objects['fast_rounds']}  table {table['fast_rounds']}")
+    print(f"blocks:       objects {objects['blocks']}  table {table['blocks']}")
+
+    differ = [key for key in objects if objects[key] != table[key]]
+    if differ:
+        sys.exit(f"node table results differ: {', '.join(differ)}")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,55 @@
+'''
+    Start-up benchmark: time for a fresh interpreter (e.g. a sweep worker - see Runner) to import the simulator
+    and to set up a simulation
+
+    Run from src/:
+        python startup_benchmark.py [repeats] [Nn]
+
+    Fails if the core engine imports one of the optional heavy packages (HEAVY) - they must only be
+    imported by the features that need them (Metrics.plot_metrics, Export).
+'''
+import statistics
+import subprocess
+import sys
+
+HEAVY = ("pandas", "matplotlib", "pyarrow", "seaborn", "scipy")
+
+IMPORT = '''
+import sys, time
+t = time.perf_counter()
+import Chain.Manager, Chain.Runner
+import Chain.Consensus.PBFT.PBFT, Chain.Consensus.BigFoot.BigFoot
+print(time.perf_counter() - t)
+print(",".join(sorted({m.split(".")[0] for m in sys.modules} & set(sys.argv[1:]))))
+'''
+
+SET_UP = '''
+import sys, time
+t = time.perf_counter()
+import Chain.Runner as Runner
+m = Runner.configure({"Nn": int(sys.argv[1])})
+m.set_up()
+print(time.perf_counter() - t)
+'''
+
+def measure(code, *args):
+    out = subprocess.run([sys.executable, "-c", code, *args], capture_output=True, text=True, check=True)
+    return out.stdout.split("\n")
+
+def main(repeats=5, Nn=100):
+    imports, heavy = [], set()
+    for _ in range(repeats):
+        lines = measure(IMPORT, *HEAVY)
+        imports.append(float(lines[0]))
+        heavy.update(x for x in lines[1].split(",") if x)
+
+    set_ups = [float(measure(SET_UP, str(Nn))[-2]) for _ in range(repeats)]
+
+    print(f"import:  median {statistics.median(imports):.3f}s  min {min(imports):.3f}s")
+    print(f"set up (Nn={Nn}):  median {statistics.median(set_ups):.3f}s  min {min(set_ups):.3f}s")
+
+    if heavy:
+        sys.exit(f"core engine imports {', '.join(sorted(heavy))}")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))